@@ -0,0 +1,125 @@
+"""
+Assistant Menu
+--------------
+
+The interactive airport assistant menu shared by vosk_file.py and
+deepspeech_file.py. The engine is chosen by the calling script, or from the
+framework menu when this module is run itself; options that only exist for
+one engine (such as microphone input) are passed in as extra options.
+
+------------------------
+
+"""
+from corpus import (english_clean_reference, english_audio_file_clean, english_noisy_reference,
+                    english_audio_file_noisy, english_list, italian_list, spanish_list)
+from model_registry import registry
+from recognizer import BACKENDS, create_recognizer
+from result_cache import result_cache
+from scoring import wer, WerAccumulator
+from tracing import tracer
+
+
+def menu(extra_options=()):
+    print("Welcome to your virtual airport assistant")
+    print("Please select your preferred language: ")
+    print("[1] Load English Language Personal Audio")
+    print("[2] Load English Language Coursera Sample")
+    print("[3] Load Italian Language Coursera Sample")
+    print("[4] Load Spanish Language Coursera Sample")
+    for number, label, _ in extra_options:
+        print("[%d] %s" % (number, label))
+    print("[0] Exit")
+
+
+def framework_selection():
+    """print the registered engines, returns them in menu order."""
+    engines = sorted({cls.name for cls in BACKENDS.values()})
+    print("Please select your preferred framwork: ")
+    for number, engine in enumerate(engines, 1):
+        print("[%d] %s" % (number, engine))
+    print("[0] Exit")
+    return engines
+
+
+def loadAssistant(recognizer, audio_file):
+    """transcribe one file (or fetch it from the result cache), printing (not raising) any error."""
+    try:
+        return result_cache.transcribe(recognizer, audio_file)
+    except Exception as e:
+        tracer.count("errors")
+        print(e.args)
+
+
+def evaluate(recognizer, file_list):
+    scores = WerAccumulator()
+    for item in file_list:
+        processed_node = loadAssistant(recognizer, item[1])
+        print(processed_node)
+        percentage = scores.add(item[0], processed_node, recognizer.language, recognizer.name, debug=True)
+        print(percentage)
+        print("\n")
+    scores.report()
+    registry.report()
+
+
+def select_engine():
+    """ask for an engine with framework_selection(), returns None on exit."""
+    while True:
+        engines = framework_selection()
+        option = int(input("Your selection is: "))
+        if option == 0:
+            return None
+        if 1 <= option <= len(engines):
+            return engines[option - 1]
+        print("Invalid option, please choose an appropriate number")
+
+
+def run_menu(engine=None, extra_options=()):
+    """interactive loop; extra_options are (number, label, handler) with handler() -> keep going.
+
+    Without an engine, the framework menu asks for one first.
+    """
+    if engine is None:
+        engine = select_engine()
+        if engine is None:
+            print("We'll see you again! Good Day!")
+            return
+    handlers = {number: handler for number, _, handler in extra_options}
+    languages = {2: ("English", "english", english_list),
+                 3: ("Italian", "italian", italian_list),
+                 4: ("Spanish", "spanish", spanish_list)}
+    flag = True
+
+    while flag:
+        menu(extra_options)
+        option = int(input("Your selection is: "))
+
+        if option == 1:
+            print("English Language Personal Test Mode Selected!")
+            recognizer = create_recognizer(engine, "english")
+            processed_node_1 = loadAssistant(recognizer, english_audio_file_clean)
+            processed_node_2 = loadAssistant(recognizer, english_audio_file_noisy)
+            percentage_1 = wer(english_clean_reference, processed_node_1 or "", debug=True)
+            percentage_2 = wer(english_noisy_reference, processed_node_2 or "", debug=True)
+            print(percentage_1, "\n", percentage_2)
+            registry.report()
+
+        elif option in languages:
+            title, language, file_list = languages[option]
+            print("%s Language Coursera Sample Files Selected!" % title)
+            evaluate(create_recognizer(engine, language), file_list)
+            flag = False
+
+        elif option in handlers:
+            flag = handlers[option]()
+
+        elif option == 0:
+            print("We'll see you again! Good Day!")
+            flag = False
+
+        else:
+            print("Invalid option, please choose an appropriate number")
+
+
+if __name__ == "__main__":
+    run_menu()
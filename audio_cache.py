@@ -0,0 +1,73 @@
+"""
+Audio Cache
+-----------
+
+Shared audio loading for the Vosk and DeepSpeech paths.
+
+Each file is decoded and resampled once per target sample rate and stored as
+an int16 .npy file named after the hash of the file's content, so renamed or
+copied recordings still hit the cache and edited ones never do. Later loads
+memory-map the cached array, and every engine gets an int16 view of the same
+pages instead of its own decoded copy.
+
+Decoding streams the file block by block into the memory-mapped .npy (see
+ingestion.save_npy), so even a cold load of a long recording never holds
+the whole file in memory.
+
+The cache directory is .audio_cache, or AUDIO_CACHE_DIR when set.
+
+------------------------
+
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+CACHE_DIR = os.environ.get("AUDIO_CACHE_DIR", ".audio_cache")
+
+_hashes = {}
+_hash_lock = threading.Lock()
+
+
+def file_hash(path):
+    """sha1 of a file's content, remembered for as long as the file is unchanged."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        digest = _hashes.get(key)
+    if digest is None:
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(block)
+        digest = sha1.hexdigest()
+        with _hash_lock:
+            _hashes[key] = digest
+    return digest
+
+
+def load_audio(path, samplerate, cache_dir=None):
+    """int16 samples of an audio file at samplerate, as a read-only memory map."""
+    cache_dir = cache_dir or CACHE_DIR
+    cached = os.path.join(cache_dir, "%s_%d.npy" % (file_hash(path), samplerate))
+    if not os.path.exists(cached):
+        from ingestion import save_npy
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a private name first so concurrent workers never read a partial file
+        partial = "%s.%d.%d.tmp" % (cached, os.getpid(), threading.get_ident())
+        try:
+            save_npy(path, partial, samplerate)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.replace(partial, cached)
+    return np.load(cached, mmap_mode="r")
+
+
+def to_float(samples):
+    """int16 samples to float32 in -1..1, for DSP stages such as noise reduction."""
+    return samples.astype(np.float32) / 32767
@@ -0,0 +1,356 @@
+"""
+Batch Transcription
+-------------------
+
+Runs a manifest of (reference, audio_file, language, engine) items over a
+process pool.
+
+- Vosk models are loaded once in the parent before the pool forks, so
+  every worker shares the parent's copy copy-on-write instead of loading a
+  private one. Other models (and every model where fork is not available)
+  are loaded once per worker, in the pool initializer: DeepSpeech's
+  TensorFlow runtime does not survive fork(), so a run that uses it (or
+  whose parent already holds a DeepSpeech model) spawns its workers; its
+  graph and scorer are memory-mapped, so the page cache shares them anyway
+- Results are streamed back as they finish, in manifest order
+- Work is handed out in chunks so that per-item IPC stays small next to
+  the cost of decoding a file
+- With --details, word timings, confidences and N-best alternatives are
+  collected in the same pass and written as columns (see word_timings.py);
+  an existing details file is never replaced, so a resumed run writes its
+  items to a file of its own
+- With --domain, utterances are decoded against the domain phrase grammar
+  (see grammar.py) instead of the open vocabulary; --phrases FILE replaces
+  the default domain phrases with the phrases of FILE
+- Items already in the result cache are answered by the parent process,
+  and only the misses are sent to (and load models in) the pool
+- --output is an append-only checkpoint (see checkpoint.py): a rerun skips
+  the items that already succeeded in the same mode, so an interrupted run
+  resumes
+- --memory reports the RSS and PSS of the parent and every worker, and the
+  memory saved by sharing the models (see memory_report.py)
+- --shard i/N runs one of N deterministic shards of the manifest, so a large
+  corpus can be spread over several machines; merge_results.py combines
+  the shards' outputs into one report
+
+Usage:
+
+    python batch_transcribe.py --engine vosk --language spanish
+    python batch_transcribe.py --manifest corpus.jsonl --processes 8 --output results.jsonl
+    python batch_transcribe.py --manifest corpus.csv --shard 0/4 --output results.0.jsonl
+    python batch_transcribe.py --manifest kiosk.csv --phrases kiosk_phrases.txt
+
+------------------------
+
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+from checkpoint import finished, open_results, record_item, write_record
+from corpus import evaluation_manifest, item_key, read_manifest, shard
+from grammar import load_phrases
+from memory_report import children_memory, print_report
+from model_registry import registry
+from recognizer import BACKENDS, create_recognizer
+from result_cache import result_cache
+from scoring import WerAccumulator
+from word_timings import ColumnarWriter
+
+BatchResult = namedtuple("BatchResult", ["index", "item", "hypothesis", "seconds", "error", "cached", "details"])
+
+# (engine, language, domain, phrases) -> Recognizer, one set per worker process
+_recognizers = {}
+# (engine, language) -> configured Recognizer handed to transcribe_batch,
+# used instead of a default one built by name
+_configured = {}
+
+
+def _recognizer(engine, language):
+    if (engine, language) in _configured:
+        return _configured[(engine, language)]
+    key = (engine, language, _domain, _phrases)
+    if key not in _recognizers:
+        _recognizers[key] = create_recognizer(engine, language, domain=_domain, phrases=_phrases)
+    return _recognizers[key]
+
+
+# whether workers write their results to the result cache
+_use_cache = True
+# None for plain text, else the number of N-best alternatives to collect
+_alternatives = None
+# whether recognizers decode against the domain grammar
+_domain = False
+# the domain phrases, None for each language's default ones
+_phrases = None
+# (engine, language) -> error of a model that failed to load, so its items
+# fail straight away instead of retrying the load
+_load_errors = {}
+
+
+def _preload(preload):
+    """load each (engine, language) model, recording failures instead of raising.
+
+    An exception escaping the pool initializer kills the worker, and the
+    pool would respawn it forever.
+    """
+    for engine, language in preload:
+        try:
+            _recognizer(engine, language).load()
+        except Exception as e:
+            _load_errors[(engine, language)] = repr(e)
+
+
+def _configure(recognizers):
+    _configured.clear()
+    for recognizer in recognizers:
+        _configured[(recognizer.name, recognizer.language)] = recognizer
+
+
+def _init_worker(preload, use_cache=True, alternatives=None, domain=False, recognizers=(), phrases=None):
+    """pool initializer, loads each (engine, language) model once per worker.
+
+    Models the parent loaded before forking are already in the registry, so
+    loading them here reuses the shared copy.
+    """
+    global _use_cache, _alternatives, _domain, _phrases
+    _use_cache = use_cache
+    _alternatives = alternatives
+    _domain = domain
+    _phrases = phrases
+    _configure(recognizers)
+    _preload(preload)
+
+
+def _transcribe_item(indexed_item):
+    index, item = indexed_item
+    start = time.perf_counter()
+    try:
+        if (item.engine, item.language) in _load_errors:
+            raise RuntimeError("Recognizer unavailable: %s" % _load_errors[(item.engine, item.language)])
+        recognizer = _recognizer(item.engine, item.language)
+        details = None
+        if _alternatives is not None:
+            details = recognizer.transcribe_detailed(item.audio_file, _alternatives)
+            hypothesis = details.text
+        elif _use_cache:
+            hypothesis = result_cache.transcribe(recognizer, item.audio_file)
+        else:
+            hypothesis = recognizer.transcribe_file(item.audio_file)
+        error = None
+    except Exception as e:
+        hypothesis = None
+        details = None
+        error = repr(e)
+    return BatchResult(index, item, hypothesis, time.perf_counter() - start, error, False, details)
+
+
+def _cached_results(items):
+    """index -> BatchResult for the items whose result is already cached."""
+    cached = {}
+    if not result_cache.enabled:
+        return cached
+    for index, item in enumerate(items):
+        start = time.perf_counter()
+        try:
+            recognizer = _recognizer(item.engine, item.language)
+            if not recognizer.cacheable:
+                continue
+            hypothesis = result_cache.get(result_cache.key(recognizer, item.audio_file))
+        except Exception:
+            # unknown engine, bad settings or missing file, the worker reports it
+            continue
+        if hypothesis is not None:
+            cached[index] = BatchResult(index, item, hypothesis, time.perf_counter() - start, None, True, None)
+    return cached
+
+
+def _chunksize(count, processes):
+    # A few chunks per worker keeps the pool balanced when file lengths vary
+    return max(1, count // (processes * 4))
+
+
+def _fork_safe(engine):
+    # unknown engines never load a model, their items just fail
+    return engine not in BACKENDS or BACKENDS[engine].fork_safe
+
+
+def _pool_context(share_models, preload):
+    """fork after loading the fork-safe models in the parent, so the workers share them.
+
+    The workers are spawned instead when an engine that does not survive
+    fork() is preloaded, or already has a model in the parent's registry.
+    """
+    loaded = {model["engine"] for model in registry.stats()["models"]}
+    if not all(_fork_safe(engine) for engine in loaded | {engine for engine, _ in preload}):
+        return multiprocessing.get_context("spawn"), False
+    if not share_models or not preload or "fork" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context(), False
+    _preload(preload)
+    # keep the parent's objects out of the collector, which would otherwise
+    # write to (and so copy) their pages in every worker
+    gc.freeze()
+    return multiprocessing.get_context("fork"), True
+
+
+def transcribe_batch(manifest, processes=None, chunksize=None, preload=None, use_cache=True, alternatives=None,
+                     domain=False, share_models=True, on_memory=None, recognizers=(), phrases=None):
+    """transcribe every manifest item, yielding results in manifest order.
+
+    With alternatives set (0 or more), every result carries a
+    DetailedTranscript; the result cache only holds plain text, so it is not
+    consulted then.
+
+    recognizers are configured Recognizer instances (e.g. with an explicit
+    model, or non-default settings); the items of their (name, language) are
+    transcribed by a copy of them in every worker.
+
+    phrases, with domain, replace the default domain phrases of every
+    language (see grammar.load_phrases).
+
+    on_memory, if given, is called with a memory_report.pool_memory() report
+    of the parent and the workers once every item is done.
+    """
+    global _domain, _phrases
+    items = list(manifest)
+    if not items:
+        return
+    # the parent resolves cache hits with the same kind of recognizer
+    _domain = domain
+    _phrases = tuple(phrases) if phrases is not None else None
+    _load_errors.clear()
+    _configure(recognizers)
+    cached = _cached_results(items) if use_cache and alternatives is None else {}
+    pending = [(index, item) for index, item in enumerate(items) if index not in cached]
+    if not pending:
+        for index in range(len(items)):
+            yield cached[index]
+        return
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, len(pending))
+    if preload is None:
+        preload = sorted({(item.engine, item.language) for _, item in pending})
+    chunksize = chunksize or _chunksize(len(pending), processes)
+
+    context, frozen = _pool_context(share_models, preload)
+    try:
+        pool = context.Pool(processes, initializer=_init_worker,
+                            initargs=(preload, use_cache, alternatives, domain, recognizers, _phrases))
+    finally:
+        if frozen:
+            # the workers are forked, the parent can collect again
+            gc.unfreeze()
+    with pool:
+        # imap hands results back in submission order as soon as each one and
+        # all of its predecessors are done, so output is deterministic while
+        # still streaming.
+        results = pool.imap(_transcribe_item, pending, chunksize)
+        for index in range(len(items)):
+            yield cached[index] if index in cached else next(results)
+        if on_memory is not None:
+            # measured while the workers still hold their models
+            on_memory(children_memory(context.active_children()))
+
+
+def _run_path(path):
+    """path, or the first of NAME.1.EXT, NAME.2.EXT, ... not taken yet.
+
+    A resumed run only decodes the items left, so its details must not
+    replace those of the earlier runs.
+    """
+    stem, ext = os.path.splitext(path)
+    candidate = path
+    number = 0
+    while os.path.exists(candidate):
+        number += 1
+        candidate = "%s.%d%s" % (stem, number, ext)
+    return candidate
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe a manifest over a process pool")
+    parser.add_argument("--manifest", help="JSON lines (.jsonl) or CSV (.csv) manifest of reference, audio_file, "
+                                           "language, engine")
+    parser.add_argument("--engine", action="append", choices=sorted(BACKENDS),
+                        help="engine for the built-in evaluation lists (repeatable)")
+    parser.add_argument("--language", action="append", help="language of the built-in evaluation lists (repeatable)")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--output", help="append results as JSON lines to this checkpoint file instead of "
+                                         "printing them; items already done in it are skipped")
+    parser.add_argument("--shard", help="only run shard i of N (i/N, numbered from 0)")
+    parser.add_argument("--no-cache", action="store_true", help="decode every file, ignoring the result cache")
+    parser.add_argument("--details", help="also write word timings, confidences and N-best alternatives "
+                                          "to this .npz (or .parquet) file; an existing file is kept and "
+                                          "this run's items go to the next free NAME.1.npz, NAME.2.npz, ...")
+    parser.add_argument("--alternatives", type=int, default=0, help="N-best alternatives to keep with --details")
+    parser.add_argument("--domain", action="store_true", help="decode against the domain phrase grammar")
+    parser.add_argument("--phrases", help="domain phrases, one per line, instead of the evaluation "
+                                          "references (implies --domain)")
+    parser.add_argument("--no-share", action="store_true",
+                        help="load the Vosk models in every worker instead of sharing the parent's copy")
+    parser.add_argument("--memory", action="store_true", help="report the memory of the parent and every worker")
+    args = parser.parse_args(argv)
+
+    if args.manifest:
+        manifest = read_manifest(args.manifest)
+    else:
+        manifest = evaluation_manifest(args.engine or ["vosk"], args.language)
+    if args.shard:
+        try:
+            manifest = shard(manifest, args.shard)
+        except ValueError as e:
+            parser.error(e.args[0])
+
+    phrases = load_phrases(args.phrases) if args.phrases else None
+    domain = args.domain or phrases is not None
+    mode = "domain:" + args.phrases if phrases is not None else "domain" if domain else "open"
+    scores = WerAccumulator()
+    done = {}
+    if args.output:
+        done = finished(args.output, mode)
+        # the summary covers the whole results file, not just this run
+        for record in done.values():
+            item = record_item(record)
+            scores.add(item.reference, record["hypothesis"], item.language, item.engine)
+        skipped = len(manifest)
+        manifest = [item for item in manifest if item_key(item) not in done]
+        skipped -= len(manifest)
+        if skipped:
+            print("Skipping %d item(s) already done in %s" % (skipped, args.output), file=sys.stderr)
+    out = open_results(args.output) if args.output else sys.stdout
+    details = ColumnarWriter() if args.details else None
+    memory = []
+    start = time.perf_counter()
+    try:
+        for result in transcribe_batch(manifest, args.processes, args.chunksize, use_cache=not args.no_cache,
+                                       alternatives=args.alternatives if args.details else None,
+                                       domain=domain, phrases=phrases, share_models=not args.no_share,
+                                       on_memory=memory.append if args.memory else None):
+            item = result.item
+            score = scores.add(item.reference, result.hypothesis, item.language, item.engine)
+            record = dict(item._asdict(), mode=mode, hypothesis=result.hypothesis, WER=score["WER"],
+                          seconds=round(result.seconds, 3), error=result.error, cached=result.cached)
+            write_record(out, record)
+            if details is not None and result.details is not None:
+                details.add(item.audio_file, result.details)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if details is not None and manifest:
+        details_path = _run_path(args.details)
+        details.save(details_path)
+        print("Details of %d file(s) written to %s" % (len(manifest), details_path), file=sys.stderr)
+    print("Transcribed %d file(s) in %.2fs" % (len(manifest), time.perf_counter() - start), file=sys.stderr)
+    print(json.dumps(scores.summary(), ensure_ascii=False, indent=2), file=sys.stderr)
+    for report in memory:
+        print_report(report, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
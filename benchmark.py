@@ -0,0 +1,312 @@
+"""
+Benchmark
+---------
+
+Non-interactive, manifest-driven comparison of the Vosk and DeepSpeech
+engines.
+
+For every engine and language the harness records
+
+- cold load time (the first model load in a fresh process)
+- warm inference time per file, as p50/p95/p99 latency and real-time factor
+  (every file is transcribed once untimed first, so decoding it into the
+  audio cache is not counted)
+- failures, files whose transcription raised; they score as empty
+- peak resident memory of the process that ran the engine
+- corpus WER and CER with confidence intervals
+
+Each engine runs in its own freshly spawned process so that load times are
+really cold and peak RSS is not shared between engines. Results are written
+as JSON and/or CSV together with the run metadata (time, git commit, host,
+Python version, manifest hash), so runs can be compared over time.
+
+With --domain, every engine decodes against the domain phrase grammar (see
+grammar.py); run with and without it to compare the two modes. --phrases
+FILE decodes against the phrases of FILE instead of the evaluation
+references.
+
+The "stub" engine (alias "fake") needs no models or audio and makes the
+harness itself testable on any machine.
+
+Usage:
+
+    python benchmark.py --engine vosk --engine deepspeech --json bench.json --csv bench.csv
+    python benchmark.py --engine stub
+
+------------------------
+
+"""
+import argparse
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import queue
+import subprocess
+import sys
+import time
+import wave
+
+from corpus import evaluation_manifest, read_manifest
+from grammar import load_phrases
+from recognizer import BACKENDS, StubRecognizer, create_recognizer
+from result_cache import result_cache
+from scoring import WerAccumulator
+
+def _recognizer(engine, language, manifest, domain=False, phrases=None):
+    backend = BACKENDS[engine]
+    if issubclass(backend, StubRecognizer):
+        # so the stub knows the references of a custom manifest
+        backend.add_references(manifest)
+    return create_recognizer(engine, language, domain=domain, phrases=phrases)
+
+
+def _duration(recognizer, audio_file):
+    if hasattr(recognizer, "duration"):
+        return recognizer.duration(audio_file)
+    try:
+        with wave.open(audio_file) as wf:
+            return wf.getnframes() / float(wf.getframerate())
+    except (OSError, EOFError, wave.Error):
+        return None
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2.0 ** 20 if sys.platform == "darwin" else 2.0 ** 10), 1)
+
+
+def _percentile(values, q):
+    """nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(math.ceil(q / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _round(value, digits):
+    return None if value is None else round(value, digits)
+
+
+def _cached_hypotheses(recognizer, items):
+    """audio_file -> cached text, for the items already in the result cache."""
+    if not recognizer.cacheable:
+        return {}
+    cached = {}
+    for item in items:
+        hypothesis = result_cache.get(result_cache.key(recognizer, item.audio_file))
+        if hypothesis is not None:
+            cached[item.audio_file] = hypothesis
+    return cached
+
+
+def run_engine(engine, manifest, repeats=1, use_cache=False, domain=False, phrases=None):
+    """benchmark one engine in the current process, returns one row per language.
+
+    phrases, with domain, replace the default domain phrases of every language.
+
+    With use_cache, cached files are scored without being decoded (and left
+    out of the timings), and fresh results are added to the result cache.
+    """
+    items = [item for item in manifest if item.engine == engine]
+    rows = []
+    for language in sorted({item.language for item in items}):
+        language_items = [item for item in items if item.language == language]
+        recognizer = _recognizer(engine, language, manifest, domain, phrases)
+        cached = _cached_hypotheses(recognizer, language_items) if use_cache else {}
+        load_seconds = None
+        if len(cached) < len(language_items):
+            start = time.perf_counter()
+            try:
+                recognizer.load()
+                load_seconds = time.perf_counter() - start
+            except Exception as e:
+                # every file then fails on its own and is counted below
+                print("%s/%s: model load failed: %r" % (engine, language, e), file=sys.stderr)
+
+        scores = WerAccumulator()
+        latencies = []
+        audio_seconds = 0.0
+        timed_audio_seconds = 0.0
+        timed_seconds = 0.0
+        failures = 0
+        for item in language_items:
+            duration = _duration(recognizer, item.audio_file)
+            audio_seconds += duration or 0.0
+            if item.audio_file in cached:
+                scores.add(item.reference, cached[item.audio_file], language, engine)
+                continue
+            try:
+                # untimed warm-up, which also pays the audio cache decode and
+                # write; its result is the one scored
+                hypothesis = recognizer.transcribe_file(item.audio_file)
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    recognizer.transcribe_file(item.audio_file)
+                    elapsed = time.perf_counter() - start
+                    latencies.append(elapsed)
+                    if duration:
+                        timed_audio_seconds += duration
+                        timed_seconds += elapsed
+            except Exception as e:
+                # one bad file must not abort the whole engine run
+                print("%s/%s: %s failed: %r" % (engine, language, item.audio_file, e), file=sys.stderr)
+                failures += 1
+                scores.add(item.reference, None, language, engine)
+                continue
+            if use_cache and recognizer.cacheable:
+                result_cache.put(result_cache.key(recognizer, item.audio_file), hypothesis)
+            scores.add(item.reference, hypothesis, language, engine)
+
+        summary = scores.summary()["corpus"]
+        rows.append({
+            "engine": engine,
+            "language": language,
+            "mode": "domain" if domain else "open",
+            "files": len(language_items),
+            "failures": failures,
+            "cache_hits": len(cached),
+            "audio_seconds": round(audio_seconds, 3),
+            "load_seconds": _round(load_seconds, 3),
+            "inference_seconds": round(sum(latencies), 3),
+            "rtf": round(timed_seconds / timed_audio_seconds, 4) if timed_audio_seconds else None,
+            "latency_p50": _round(_percentile(latencies, 50), 4),
+            "latency_p95": _round(_percentile(latencies, 95), 4),
+            "latency_p99": _round(_percentile(latencies, 99), 4),
+            "WER": summary["WER"],
+            "WER_CI_low": summary["WER_CI"][0],
+            "WER_CI_high": summary["WER_CI"][1],
+            "CER": summary["CER"],
+            "CER_CI_low": summary["CER_CI"][0],
+            "CER_CI_high": summary["CER_CI"][1],
+        })
+    peak_rss = _peak_rss_mb()
+    for row in rows:
+        row["peak_rss_mb"] = peak_rss
+    return rows
+
+
+def _run_engine_child(engine, manifest, repeats, use_cache, domain, phrases, results):
+    try:
+        results.put(("ok", run_engine(engine, manifest, repeats, use_cache, domain, phrases)))
+    except Exception as e:
+        results.put(("error", repr(e)))
+
+
+def _child_result(engine, process, results, timeout):
+    """wait for the child's result, noticing if it dies (segfault, OOM kill) or runs too long."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1.0)
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            # the result may have been posted just before the process exited
+            try:
+                return results.get(timeout=1.0)
+            except queue.Empty:
+                raise RuntimeError("%s benchmark process died with exit code %s" % (engine, process.exitcode))
+        if deadline is not None and time.monotonic() > deadline:
+            process.terminate()
+            process.join()
+            raise RuntimeError("%s benchmark timed out after %ss" % (engine, timeout))
+
+
+def run_isolated(engine, manifest, repeats=1, use_cache=False, domain=False, timeout=None, phrases=None):
+    """run_engine in a freshly spawned process, so loads are cold and RSS is per engine."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_engine_child,
+                              args=(engine, manifest, repeats, use_cache, domain, phrases, results))
+    process.start()
+    status, payload = _child_result(engine, process, results, timeout)
+    process.join()
+    if status != "ok":
+        raise RuntimeError("%s benchmark failed: %s" % (engine, payload))
+    return payload
+
+
+def run_metadata(manifest):
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    manifest_hash = hashlib.sha1(json.dumps([list(item) for item in manifest], ensure_ascii=False)
+                                 .encode("utf-8")).hexdigest()
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": commit,
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "manifest_items": len(manifest),
+            "manifest_sha1": manifest_hash}
+
+
+def write_csv(rows, path):
+    if not rows:
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark speech recognition engines")
+    parser.add_argument("--manifest", help="JSON lines manifest; defaults to the built-in evaluation lists")
+    parser.add_argument("--engine", action="append", choices=sorted(BACKENDS),
+                        help="engine to benchmark (repeatable, default vosk and deepspeech)")
+    parser.add_argument("--language", action="append", help="restrict the built-in lists to a language (repeatable)")
+    parser.add_argument("--repeats", type=int, default=1,
+                        help="timed transcriptions per file, after an untimed warm-up")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per isolated engine run")
+    parser.add_argument("--cache", action="store_true",
+                        help="score cached results without decoding them (timings cover only the misses)")
+    parser.add_argument("--domain", action="store_true", help="decode against the domain phrase grammar")
+    parser.add_argument("--phrases", help="domain phrases, one per line, instead of the evaluation "
+                                          "references (implies --domain)")
+    parser.add_argument("--no-isolate", action="store_true", help="run every engine in this process")
+    parser.add_argument("--json", help="write the report as JSON")
+    parser.add_argument("--csv", help="write one row per engine and language as CSV")
+    args = parser.parse_args(argv)
+
+    engines = args.engine or ["vosk", "deepspeech"]
+    if args.manifest:
+        manifest = [item for item in read_manifest(args.manifest) if item.engine in engines]
+    else:
+        manifest = evaluation_manifest(engines, args.language)
+
+    phrases = load_phrases(args.phrases) if args.phrases else None
+    domain = args.domain or phrases is not None
+    rows = []
+    for engine in engines:
+        if args.no_isolate:
+            rows.extend(run_engine(engine, manifest, args.repeats, args.cache, domain, phrases))
+        else:
+            rows.extend(run_isolated(engine, manifest, args.repeats, args.cache, domain, args.timeout, phrases))
+
+    report = {"meta": dict(run_metadata(manifest), phrases=args.phrases), "results": rows}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.csv:
+        write_csv(rows, args.csv)
+    if not args.json and not args.csv:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
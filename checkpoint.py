@@ -0,0 +1,90 @@
+"""
+Checkpoints
+-----------
+
+Append-only JSON lines results files, so a corpus run survives a crash or a
+preempted machine.
+
+Every finished item is written (and flushed) as one line as soon as it is
+done. A rerun with the same results file reads which items already
+succeeded in the same decoding mode ("open", "domain", or "domain:FILE"
+for a phrase file), skips them and
+appends the rest; items that failed are tried again. A line cut short by
+the crash is dropped before appending.
+
+    done = finished(path, mode)              # item keys of the successful records
+    with open_results(path) as out:
+        write_record(out, record)
+
+Records hold the manifest item fields, so results files of different shards
+can be merged and rescored (see merge_results.py).
+
+------------------------
+
+"""
+import json
+import os
+
+from corpus import ManifestItem, item_key
+
+
+def read_results(path):
+    """the records of a results file, in file order."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # the last line of a run that was killed while writing it
+                continue
+    return records
+
+
+def record_item(record):
+    return ManifestItem(**{field: record[field] for field in ManifestItem._fields})
+
+
+def record_mode(record):
+    # records written before modes existed were all open vocabulary
+    return record.get("mode", "open")
+
+
+def finished(path, mode="open"):
+    """item key -> record of every successful item of a results file decoded in mode (empty if there is none)."""
+    if not os.path.exists(path):
+        return {}
+    return {item_key(record_item(record)): record for record in read_results(path)
+            if record.get("error") is None and record_mode(record) == mode}
+
+
+def _drop_partial_line(path, block=4096):
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            step = min(block, position)
+            f.seek(position - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                position += newline + 1 - step
+                break
+            position -= step
+        if position < end:
+            f.truncate(position)
+
+
+def open_results(path):
+    """open a results file for appending."""
+    if os.path.exists(path):
+        _drop_partial_line(path)
+    return open(path, "a", encoding="utf-8")
+
+
+def write_record(out, record):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # flushed per item, so a killed process loses at most the item in flight
+    out.flush()
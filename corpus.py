@@ -0,0 +1,145 @@
+"""
+Test File Initialisation
+------------------------
+
+Evaluation recordings shared by the Vosk and DeepSpeech scripts, and the
+manifest format used to run them in batch.
+
+Total Sample:
+
+- English = 5
+- Italian = 5
+- Spanish = 5
+
+A manifest is a list of (reference, audio_file, language, engine) items,
+stored one JSON object per line (.jsonl) or as a CSV file with those four
+columns (.csv). Other fields or columns are ignored.
+
+shard(items, "i/N") picks the items of shard i out of N. An item's shard
+depends only on the item itself, so every machine computes the same split
+whatever the manifest order, and the N shards cover the manifest exactly once.
+
+------------------------
+
+"""
+import csv
+import json
+import zlib
+from collections import namedtuple
+
+# SELF RECORDINGS (CLEAN)
+english_clean_reference = "this is my very first short sentence for the demostration of my system and it will be a sentence of gibberrish"
+english_audio_file_clean = "english/Voice/english_audio_eval_1.wav"
+
+# SELF RECORDINGS (NOISY)
+english_noisy_reference = "alright this is my short sentence number two where i will be demostrating with background noises such as rain and youtube videos"
+english_audio_file_noisy = "english/Voice/english_audio_eval_2.wav"
+
+# ENGLISH TEST FILES
+english_list = [["where is the check in desk", "english/Voice/checkin.wav"],
+                ["i have lost my parents", "english/Voice/parents.wav"],
+                ["please i have lost my suitcase", "english/Voice/suitcase.wav"],
+                ["what time is my plane", "english/Voice/what_time.wav"],
+                ["where are the restuarants and shops", "english/Voice/where.wav"]]
+
+# ITALIAN TEST FILES
+italian_list = [["dove è il pancone", "italian/Voice/checkin_it.wav"],
+                ["ho perso i miei genitori", "italian/Voice/parents_it.wav"],
+                ["per favore. Ho perso la mia", "italian/Voice/suitcase_it.wav"],
+                ["a che ora e’ il mio aereo", "italian/Voice/what_time_it.wav"],
+                ["dove sono i ristoranti e i negozi", "italian/Voice/where_it.wav"]]
+
+# SPANISH TEST FILES
+spanish_list = [["dónde están los mostrador", "spanish/Voice/checkin_es.wav"],
+                ["he perdido a mis padres", "spanish/Voice/parents_es.wav"],
+                ["por favor he perdido mi maleta", "spanish/Voice/suitcase_es.wav"],
+                ["a qué hora es mi avión", "spanish/Voice/what_time_es.wav"],
+                ["dónde están los restaurantes y las tiendas", "spanish/Voice/where_es.wav"]]
+
+# NOISE SAMPLE RANGES (in samples) used by DeepSpeech's noise reduction.
+# Files without a range, or with an empty one, get an estimated noise profile.
+noise_ranges = {"english/Voice/checkin.wav": (0, 122),
+                "english/Voice/parents.wav": (0, 122),
+                "english/Voice/where.wav": (1721, 1852),
+                "english/Voice/what_time.wav": (0, 0),
+                "english/Voice/suitcase.wav": (713, 964),
+                "italian/Voice/checkin_it.wav": (0, 500),
+                "italian/Voice/parents_it.wav": (0, 500),
+                "italian/Voice/where_it.wav": (2347, 2647),
+                "italian/Voice/what_time_it.wav": (0, 215),
+                "italian/Voice/suitcase_it.wav": (0, 199),
+                "spanish/Voice/checkin_es.wav": (0, 500),
+                "spanish/Voice/parents_es.wav": (0, 500),
+                "spanish/Voice/where_es.wav": (2347, 2647),
+                "spanish/Voice/what_time_es.wav": (0, 215),
+                "spanish/Voice/suitcase_es.wav": (0, 199)}
+
+evaluation_lists = {"english": english_list,
+                    "italian": italian_list,
+                    "spanish": spanish_list}
+
+ManifestItem = namedtuple("ManifestItem", ["reference", "audio_file", "language", "engine"])
+
+
+def evaluation_manifest(engines, languages=None):
+    """build a manifest over the built-in evaluation lists."""
+    if isinstance(engines, str):
+        engines = [engines]
+    languages = languages or list(evaluation_lists)
+    return [ManifestItem(reference, audio_file, language, engine)
+            for engine in engines
+            for language in languages
+            for reference, audio_file in evaluation_lists[language]]
+
+
+def _records(path, f):
+    if path.endswith(".csv"):
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_manifest(path):
+    """read a .jsonl or .csv manifest."""
+    items = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for record in _records(path, f):
+            items.append(ManifestItem(**{field: record[field] for field in ManifestItem._fields}))
+    return items
+
+
+def write_manifest(items, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(ManifestItem._fields)
+            writer.writerows(items)
+            return
+        for item in items:
+            f.write(json.dumps(item._asdict(), ensure_ascii=False) + "\n")
+
+
+def item_key(item):
+    """identifies an item across manifests, shards and result files."""
+    return "%s\t%s\t%s" % (item.engine, item.language, item.audio_file)
+
+
+def parse_shard(text):
+    """"i/N" -> (i, N), with shards numbered from 0."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError("Shard must look like i/N: %s" % text)
+    if not 0 <= index < count:
+        raise ValueError("Shard index must be in 0..%d: %s" % (count - 1, text))
+    return index, count
+
+
+def shard(items, spec):
+    """the items of shard spec ("i/N" or (i, N))."""
+    index, count = parse_shard(spec) if isinstance(spec, str) else spec
+    return [item for item in items
+            if zlib.crc32(item_key(item).encode("utf-8")) % count == index]
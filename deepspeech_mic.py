@@ -2,72 +2,148 @@
 # which has a Mozzila Public License:
 # https://github.com/mozilla/DeepSpeech/blob/master/LICENSE
 
-from deepspeech import Model, version
-import librosa as lr
+import itertools
 import numpy as np
-import sounddevice as sd
-import os
+import sys
+from audio_cache import to_float
+from noise_profile import StreamingDenoiser, noise_profiles
+from recognizer import DeepSpeechRecognizer
+from ring_buffer import RingBuffer
+from vad import Segmenter, create_vad
 
 
-## set up the model
-scorer_english = "english/deepspeech-0.9.3-models.scorer"
-model_english = "english/deepspeech-0.9.3-models.pbmm"
+# Importing this module is cheap and needs no audio device: the model, the
+# sound device and the capture buffers are only set up when it is run.
 
-scorer_italian = "italian/kenlm_it.scorer"
-model_italian = "italian/output_graph_it.pbmm"
+# streaming = True feeds every speech frame to a DeepSpeech stream as it
+# arrives and prints partial transcripts, so the result is ready as soon as the
+# speaker stops. streaming = False runs ds.stt on each complete utterance.
+streaming = True
+partial_seconds = 0.5   # audio between partial decodes
 
-scorer_spanish = "spanish/kenlm_es.scorer"
-model_spanis = "spanish/output_graph_es.pbmm"
+# Voice activity detection: "energy" (built in) or "webrtc" (needs the
+# webrtcvad package). Only speech segments, padded with pre_roll_ms before and
+# hangover_ms after, reach the recognizer; hangover_ms is the end-of-utterance
+# latency.
+vad_kind = "energy"
+frame_ms = 30
+pre_roll_ms = 300
+hangover_ms = 400
 
-assert os.path.exists(scorer_english), "You need to download a scroere  from the deepspeech release page: https://github.com/mozilla/DeepSpeech/releases"
-assert os.path.exists(model_english), "You need to download a  model from the deepspeech release page: https://github.com/mozilla/DeepSpeech/releases"
-assert os.path.exists(scorer_italian), "You need to download a scroere  from the deepspeech release page: https://github.com/mozilla/DeepSpeech/releases"
-assert os.path.exists(model_italian), "You need to download a  model from the deepspeech release page: https://github.com/mozilla/DeepSpeech/releases"
-assert os.path.exists(scorer_spanish), "You need to download a scroere  from the deepspeech release page: https://github.com/mozilla/DeepSpeech/releases"
-assert os.path.exists(model_spanis), "You need to download a  model from the deepspeech release page: https://github.com/mozilla/DeepSpeech/releases"
+# Stationary noise reduction of the speech audio before it is decoded. The
+# noise profile is estimated from the first noise_seconds of capture (stay
+# quiet while the assistant starts) and kept per device; speech is denoised
+# in denoise_chunk_ms chunks as it arrives.
+denoise = True
+noise_seconds = 1.0
+denoise_chunk_ms = 500
 
-ds = Model(model_english)
-ds.enableExternalScorer(scorer_english)
-desired_sample_rate = ds.sampleRate()
-
-## set up the sound device
-device_info = sd.query_devices(0, 'input')
-samplerate = int(device_info['default_samplerate'])
-#q = queue.Queue()
-audio_buffer = []
-state = {"quiet_seen":0, "quiet_want":2, "trigger_stt": False}
-
-threshold = 32768 / 50
+# Captured audio goes into a preallocated ring buffer holding at most
+# max_retention seconds; if recognition falls further behind than that the
+# oldest audio is dropped and counted as an overrun.
+max_retention = 30
 
 def callback(indata, frames, time, status):
     """audio callback function ."""
     if status:
         print(status, file=sys.stderr)
+    ring.write(indata[:, 0])
+
 
-    data = indata.reshape(1, len(indata))[0]
-    audio_buffer.extend(data)
-
-    avg = np.mean(np.abs(data))
-    if avg < threshold:
-        state["quiet_seen"] = state["quiet_seen"] + 1
-        if state["quiet_seen"] > state["quiet_want"]:
-            # trigget reocog
-            state["quiet_seen"] = 0
-            state["trigger_stt"] = True
-    else:
-        state["quiet_seen"] = 0
-
-# fire up the audio device
-with sd.InputStream(samplerate=desired_sample_rate, 
-                     blocksize = 8000, 
-                     dtype='int16',
-                     channels=1, callback=callback):
+def speech_events():
+    """yield (event, frames) from the segmenter, one captured frame at a time."""
     while True:
-        if state["trigger_stt"]:
-            audio = audio_buffer
+        frame = ring.read_exactly(segmenter.frame_samples)
+        for event in segmenter.process(frame):
+            yield event
+
+
+def utterance_frames(events):
+    """yield the frames of one utterance, up to and excluding its "end" event."""
+    for event, frames in events:
+        if event == "end":
+            return
+        for frame in frames:
+            yield frame
+
+
+def denoise_chunk(denoiser, chunk):
+    return (denoiser.process(to_float(chunk)) * 32767).astype(np.int16)
+
+
+def denoised_frames(frames):
+    """regroup an utterance's frames into denoise_chunk_ms chunks and denoise each as it fills."""
+    if profile is None:
+        yield from frames
+        return
+    denoiser = StreamingDenoiser(profile, desired_sample_rate)
+    chunk_samples = desired_sample_rate * denoise_chunk_ms // 1000
+    pending = []
+    pending_samples = 0
+    for frame in frames:
+        # views are recycled by the ring buffer, keep a copy
+        pending.append(frame.copy())
+        pending_samples += len(frame)
+        if pending_samples >= chunk_samples:
+            yield denoise_chunk(denoiser, np.concatenate(pending))
+            pending = []
+            pending_samples = 0
+    if pending:
+        yield denoise_chunk(denoiser, np.concatenate(pending))
+
+
+def run_streaming():
+    events = speech_events()
+    for event, frames in events:
+        if event != "start":
+            continue
+        utterance = denoised_frames(itertools.chain(frames, utterance_frames(events)))
+        for kind, text in recognizer.transcribe_stream(utterance):
+            print("%s: %s" % ("result" if kind == "final" else kind, text))
+
+
+def run_buffered():
+    audio_buffer = []
+    for event, frames in speech_events():
+        if event == "end":
+            audio = np.concatenate(audio_buffer)
+            if profile is not None:
+                audio = denoise_chunk(StreamingDenoiser(profile, desired_sample_rate), audio)
             print("received audio", len(audio), "running neural analysis :) ")
             res = ds.stt(audio)
             print("result: "+res)
-            state["trigger_stt"] = False
             audio_buffer.clear()
-            
+            continue
+        # views are recycled by the ring buffer, keep a copy of these frames
+        audio_buffer.extend(frame.copy() for frame in frames)
+
+
+if __name__ == "__main__":
+    import sounddevice as sd
+
+    ## set up the model (paths are checked by the recognizer's language models)
+    recognizer = DeepSpeechRecognizer("english", partial_seconds=partial_seconds)
+    ds = recognizer.load()
+    desired_sample_rate = ds.sampleRate()
+
+    segmenter = Segmenter(create_vad(vad_kind, desired_sample_rate), desired_sample_rate,
+                          frame_ms=frame_ms, pre_roll_ms=pre_roll_ms, hangover_ms=hangover_ms)
+    blocksize = segmenter.frame_samples
+    ring = RingBuffer.for_duration(max_retention, desired_sample_rate)
+
+    # fire up the audio device
+    with sd.InputStream(samplerate=desired_sample_rate, 
+                         blocksize = blocksize, 
+                         dtype='int16',
+                         channels=1, callback=callback):
+        profile = None
+        if denoise:
+            noise = ring.read_exactly(int(noise_seconds * desired_sample_rate))
+            profile = noise_profiles.get("microphone", to_float(noise), desired_sample_rate)
+        try:
+            if streaming:
+                run_streaming()
+            else:
+                run_buffered()
+        except KeyboardInterrupt:
+            print("ring buffer:", ring.stats())
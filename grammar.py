@@ -0,0 +1,86 @@
+"""
+Domain Grammars
+---------------
+
+Restricted decoding for the small, closed set of kiosk phrases.
+
+- Vosk decodes against a grammar: a JSON list of the allowed phrases (plus
+  "[unk]" for anything else), passed to KaldiRecognizer. The decoding graph
+  shrinks to those phrases, which is much faster than the open vocabulary.
+- DeepSpeech keeps its scorer but boosts the domain's words as hot-words,
+  leaving out function words ("the", "is", "il", ...) that a boost would
+  only make the decoder insert everywhere. Hot-words belong to the model,
+  so a DeepSpeech model with them is loaded separately from the plain one.
+  A domain-specific KenLM scorer can be used instead, through the
+  recognizer's scorer argument.
+
+Grammars and hot-word lists are compiled once per phrase list and cached.
+The phrases default to the evaluation references of each language, and
+load_phrases reads a phrase file with one phrase per line.
+
+------------------------
+
+"""
+import functools
+import json
+import re
+
+from corpus import evaluation_lists
+
+# language -> phrases the kiosk is expected to hear
+DOMAIN_PHRASES = {language: [reference for reference, _ in file_list]
+                  for language, file_list in evaluation_lists.items()}
+
+HOT_WORD_BOOST = 10.0
+
+# language -> words too common to boost
+STOPWORDS = {
+    "english": frozenset("a an and are at can do does for from have i in is it me my of on or the there this "
+                         "to what where which with you your".split()),
+    "italian": frozenset("a al alla c che con da del della di dove e è ho i il in la le lo mi per un una "
+                         "uno".split()),
+    "spanish": frozenset("a al de del dónde el en es está están la las lo los me mi por que se un una y "
+                         "yo".split()),
+}
+
+
+def normalise(phrase):
+    """lower case words without punctuation, as the recognizers output them."""
+    return " ".join(re.sub(r"[^\w' ]+", " ", phrase.lower()).split())
+
+
+def load_phrases(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _phrases(language, phrases):
+    if phrases is None:
+        if language not in DOMAIN_PHRASES:
+            raise KeyError("No domain phrases for language: %s" % language)
+        phrases = DOMAIN_PHRASES[language]
+    return tuple(phrases)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_grammar(phrases, unknown):
+    allowed = sorted({normalise(phrase) for phrase in phrases} - {""})
+    if unknown:
+        allowed.append("[unk]")
+    return json.dumps(allowed, ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_hot_words(phrases, boost, stopwords):
+    words = sorted({word for phrase in phrases for word in normalise(phrase).split()} - stopwords)
+    return tuple((word, boost) for word in words)
+
+
+def vosk_grammar(language, phrases=None, unknown=True):
+    """the grammar JSON for KaldiRecognizer; unknown lets out-of-domain speech map to [unk]."""
+    return _compile_grammar(_phrases(language, phrases), unknown)
+
+
+def hot_words(language, phrases=None, boost=HOT_WORD_BOOST):
+    """((word, boost), ...) for DeepSpeech's addHotWord."""
+    return _compile_hot_words(_phrases(language, phrases), boost, STOPWORDS.get(language, frozenset()))
@@ -0,0 +1,244 @@
+"""
+Audio Ingestion
+---------------
+
+Streams any recording to the recognizers as mono int16 blocks at the rate
+they need, so nothing has to be converted offline first.
+
+- WAV of any channel count and 8/16/24/32-bit PCM is read with the wave
+  module; FLAC, float WAV and everything else libsndfile understands is read
+  through soundfile (installed with librosa)
+- Channels are downmixed, or one channel is selected, block by block
+- The rate is converted with a streaming resampler (soxr, also installed
+  with librosa; a linear interpolator is used if it is missing)
+
+Every stage works on one block at a time in int16/int32, so memory does not
+grow with the file length and no float copy of the file is ever made.
+
+    for block in stream("call.flac", 16000, channel=1):
+        ...
+    texts = transcribe_channels(create_recognizer("vosk", "english"), "call.wav")
+
+------------------------
+
+"""
+import math
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+BLOCK_FRAMES = 8000
+
+
+def _wav_to_int16(data, sampwidth):
+    """little-endian PCM bytes of any width to int16 (interleaved)."""
+    if sampwidth == 2:
+        return np.frombuffer(data, dtype="<i2")
+    if sampwidth == 1:
+        # 8-bit WAV is unsigned
+        return ((np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8).astype(np.int16)
+    if sampwidth == 3:
+        # keep the two most significant bytes of each 24-bit sample
+        return np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)[:, 1:].copy().view("<i2").reshape(-1)
+    if sampwidth == 4:
+        return (np.frombuffer(data, dtype="<i4") >> 16).astype(np.int16)
+    raise ValueError("Unsupported sample width: %d bytes" % sampwidth)
+
+
+def _rewind(path):
+    # an in-memory file (e.g. an upload) is read again from its start every time
+    if hasattr(path, "seek"):
+        path.seek(0)
+    return path
+
+
+class AudioSource:
+    """int16 blocks of shape (frames, channels) from an audio file, a path or a binary file object."""
+
+    def __init__(self, path, block_frames=BLOCK_FRAMES):
+        self.path = path
+        self.block_frames = block_frames
+        self._wave = False
+        try:
+            with wave.open(_rewind(path)) as wf:
+                self.samplerate = wf.getframerate()
+                self.channels = wf.getnchannels()
+                self.frames = wf.getnframes()
+                self._wave = wf.getcomptype() == "NONE"
+        except (wave.Error, EOFError):
+            pass
+        if not self._wave:
+            import soundfile as sf
+
+            info = sf.info(_rewind(path))
+            self.samplerate = info.samplerate
+            self.channels = info.channels
+            self.frames = info.frames
+
+    @property
+    def duration(self):
+        return self.frames / float(self.samplerate)
+
+    def blocks(self):
+        if self._wave:
+            with wave.open(_rewind(self.path)) as wf:
+                sampwidth = wf.getsampwidth()
+                while True:
+                    data = wf.readframes(self.block_frames)
+                    if not data:
+                        return
+                    yield _wav_to_int16(data, sampwidth).reshape(-1, self.channels)
+        else:
+            import soundfile as sf
+
+            # libsndfile converts the sample format per block
+            for block in sf.blocks(_rewind(self.path), blocksize=self.block_frames, dtype="int16", always_2d=True):
+                yield block
+
+
+def downmix_block(block):
+    """average all channels of a (frames, channels) block into mono."""
+    if block.shape[1] == 1:
+        return block[:, 0]
+    return (block.sum(axis=1, dtype=np.int32) // block.shape[1]).astype(np.int16)
+
+
+def downmix(blocks):
+    for block in blocks:
+        yield downmix_block(block)
+
+
+def select_channel(blocks, channel):
+    for block in blocks:
+        yield np.ascontiguousarray(block[:, channel])
+
+
+class _LinearResampler:
+    """stateful linear interpolation, only used when soxr is not installed."""
+
+    def __init__(self, in_rate, out_rate):
+        self.step = in_rate / float(out_rate)
+        self.next_position = 0.0   # next output sample, in input samples
+        self.consumed = 0          # input samples seen so far
+        self.previous = None
+
+    def resample_chunk(self, block, last=False):
+        samples = block.astype(np.float32)
+        start = self.consumed
+        if self.previous is not None:
+            # carry the last sample over so positions between blocks interpolate
+            samples = np.concatenate(([self.previous], samples))
+            start -= 1
+        self.consumed += len(block)
+        if not len(samples):
+            return np.zeros(0, dtype=np.int16)
+        end = start + len(samples) - 1
+        count = int((end - self.next_position) // self.step) + 1 if end >= self.next_position else 0
+        positions = self.next_position + self.step * np.arange(count)
+        self.next_position += count * self.step
+        self.previous = samples[-1]
+        out = np.interp(positions - start, np.arange(len(samples)), samples)
+        return np.clip(np.round(out), -32768, 32767).astype(np.int16)
+
+
+def make_resampler(in_rate, out_rate):
+    """a streaming mono int16 resampler: resample_chunk(block, last=False) -> block."""
+    try:
+        import soxr
+
+        return soxr.ResampleStream(in_rate, out_rate, 1, dtype="int16")
+    except ImportError:
+        return _LinearResampler(in_rate, out_rate)
+
+
+def resample(blocks, in_rate, out_rate):
+    """convert mono int16 blocks from in_rate to out_rate, one block at a time."""
+    if in_rate == out_rate:
+        yield from blocks
+        return
+    resampler = make_resampler(in_rate, out_rate)
+    for block in blocks:
+        out = resampler.resample_chunk(block)
+        if len(out):
+            yield out
+    out = resampler.resample_chunk(np.zeros(0, dtype=np.int16), last=True)
+    if len(out):
+        yield out
+
+
+def stream(path, sample_rate, channel=None, block_frames=BLOCK_FRAMES):
+    """mono int16 blocks of a file at sample_rate; channel=None downmixes all channels."""
+    source = AudioSource(path, block_frames)
+    if channel is None:
+        blocks = downmix(source.blocks())
+    else:
+        if not 0 <= channel < source.channels:
+            raise ValueError("%s has %d channel(s), no channel %d" % (path, source.channels, channel))
+        blocks = select_channel(source.blocks(), channel)
+    return resample(blocks, source.samplerate, sample_rate)
+
+
+def _capacity(path, sample_rate):
+    """an upper bound on the samples stream() yields for path."""
+    source = AudioSource(path)
+    # resamplers may emit a few samples more than the exact ratio
+    return int(math.ceil(source.frames * sample_rate / float(source.samplerate))) + BLOCK_FRAMES
+
+
+def _fill(blocks, out):
+    """copy blocks one after another into out, returns the number of samples written."""
+    count = 0
+    for block in blocks:
+        if count + len(block) > len(out):
+            raise ValueError("More audio than the file header announces")
+        out[count:count + len(block)] = block
+        count += len(block)
+    return count
+
+
+def read(path, sample_rate, channel=None):
+    """the whole of stream() as one int16 array, filled in place block by block."""
+    out = np.empty(_capacity(path, sample_rate), dtype=np.int16)
+    out.resize(_fill(stream(path, sample_rate, channel), out), refcheck=False)
+    return out
+
+
+def save_npy(path, npy_path, sample_rate, channel=None):
+    """write stream() to an int16 .npy file through a memory map, returns the number of samples.
+
+    Only one block is in memory at a time, however long the file is.
+    """
+    capacity = _capacity(path, sample_rate)
+    out = np.lib.format.open_memmap(npy_path, mode="w+", dtype=np.int16, shape=(capacity,))
+    try:
+        count = _fill(stream(path, sample_rate, channel), out)
+        out.flush()
+        offset = out.offset
+    finally:
+        del out
+    if count < capacity:
+        # write the real length into the header, which is padded to the same
+        # size, and cut off the unused tail
+        with open(npy_path, "r+b") as f:
+            np.lib.format.write_array_header_1_0(f, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.int16)),
+                                                     "fortran_order": False, "shape": (count,)})
+            if f.tell() != offset:
+                raise RuntimeError("Unexpected .npy header size in %s" % npy_path)
+            f.truncate(offset + count * 2)
+    return count
+
+
+def _final_text(results):
+    return " ".join(text for kind, text in results if kind == "final" and text)
+
+
+def transcribe_channels(recognizer, path, workers=None):
+    """transcribe every channel of a recording separately and in parallel, returns one text per channel."""
+    channels = AudioSource(path).channels
+
+    def transcribe_channel(channel):
+        return _final_text(recognizer.transcribe_stream(stream(path, recognizer.sample_rate, channel)))
+
+    with ThreadPoolExecutor(workers or channels) as executor:
+        return list(executor.map(transcribe_channel, range(channels)))
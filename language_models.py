@@ -0,0 +1,129 @@
+"""
+Language Models
+---------------
+
+On-demand access to the per-language models of one engine.
+
+- A language model is only loaded the first time it is asked for
+- A configured set of languages can be prewarmed in the background
+- Models left unused for longer than the idle timeout are unloaded, by a
+  reaper thread that only runs once a timeout is set (the entry points set
+  it, e.g. from VOSK_IDLE_TIMEOUT), so importing starts no thread
+
+Loading goes through the shared model registry, so a model prewarmed here is
+the same object handed out to every other caller.
+
+------------------------
+
+"""
+import os
+import threading
+import time
+
+from model_registry import registry as default_registry
+
+
+class LanguageModels:
+    def __init__(self, engine, paths, idle_timeout=None, registry=None):
+        # paths: language -> model path, or (model path, scorer path)
+        self.engine = engine
+        self.paths = paths
+        self.idle_timeout = idle_timeout
+        self.registry = registry or default_registry
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stop = threading.Event()
+        if idle_timeout:
+            self._start_reaper()
+
+    def _model_args(self, language):
+        if language not in self.paths:
+            raise KeyError("Unsupported language: %s" % language)
+        path = self.paths[language]
+        if isinstance(path, (tuple, list)):
+            return path[0], path[1]
+        return path, None
+
+    def get(self, language, **settings):
+        """return the model for a language, loading it on first use."""
+        model, scorer = self._model_args(language)
+        if self.engine == "vosk":
+            message = "Please download a model for your language from https://alphacephei.com/vosk/models"
+        else:
+            message = "%s model not in directory" % language.capitalize()
+        assert os.path.exists(model), message
+        if scorer is not None:
+            assert os.path.exists(scorer), "%s scorer not in directory" % language.capitalize()
+        loaded = self.registry.get(self.engine, model, scorer, **settings)
+        with self._lock:
+            self._last_used[(language, tuple(sorted(settings.items())))] = time.monotonic()
+        return loaded
+
+    def is_loaded(self, language, **settings):
+        model, scorer = self._model_args(language)
+        return self.registry.is_loaded(self.engine, model, scorer, **settings)
+
+    def prewarm(self, languages, background=True):
+        """load the given languages ahead of their first request."""
+        languages = [language for language in languages if language]
+        if not languages:
+            return None
+
+        def warm():
+            for language in languages:
+                try:
+                    self.get(language)
+                except Exception as e:
+                    print("Prewarm of", language, "failed:", e.args)
+
+        if not background:
+            warm()
+            return None
+        thread = threading.Thread(target=warm, name="prewarm-" + self.engine, daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self, language, **settings):
+        model, scorer = self._model_args(language)
+        with self._lock:
+            self._last_used.pop((language, tuple(sorted(settings.items()))), None)
+        return self.registry.unload(self.engine, model, scorer, **settings)
+
+    def unload_idle(self, now=None):
+        """unload every model not used within the idle timeout."""
+        if not self.idle_timeout:
+            return []
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [key for key, used in self._last_used.items() if now - used > self.idle_timeout]
+        return [language for language, settings in idle if self.unload(language, **dict(settings))]
+
+    def set_idle_timeout(self, idle_timeout):
+        """unload models unused for idle_timeout seconds from now on; None or 0 turns it off."""
+        self.idle_timeout = idle_timeout or None
+        if self.idle_timeout and self._reaper is None:
+            self._start_reaper()
+
+    def _start_reaper(self):
+        def reap():
+            # the timeout may change while the reaper runs
+            while not self._stop.wait(max(1.0, (self.idle_timeout or 4.0) / 4.0)):
+                self.unload_idle()
+
+        self._reaper = threading.Thread(target=reap, name="reaper-" + self.engine, daemon=True)
+        self._reaper.start()
+
+    def close(self):
+        self._stop.set()
+
+
+def idle_timeout_from_env(name):
+    """an idle timeout in seconds from an environment variable, None when it is unset or 0."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return float(value) or None
+    except ValueError:
+        raise ValueError("%s must be a number of seconds, got %r" % (name, value))
@@ -0,0 +1,97 @@
+"""
+Long-Form Transcription
+-----------------------
+
+Transcribes recordings of any length in fixed windows instead of one
+whole-file decode, so memory and latency stay bounded.
+
+- Windows are window_seconds long, each cut at the quietest frame in the
+  last search_seconds, so cuts fall in pauses rather than inside words
+- Consecutive windows overlap by overlap_seconds around the cut, so a word
+  clipped at one window's edge is whole in the other
+- Windows are decoded on a small thread pool with at most workers + 1 in
+  flight; the audio itself comes from the memory-mapped audio cache, so
+  only the windows in flight are ever resident
+- The transcripts are stitched by aligning the words of the overlap: the
+  longest common run of words at the end of one window and the start of the
+  next is kept once
+
+------------------------
+
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+
+import numpy as np
+
+
+def _quietest(samples, lo, hi, frame):
+    """centre of the lowest-energy frame in samples[lo:hi]."""
+    count = (hi - lo) // frame
+    if count <= 0:
+        return hi
+    region = np.asarray(samples[lo:lo + count * frame], dtype=np.float32).reshape(count, frame)
+    energy = np.einsum("ij,ij->i", region, region)
+    return lo + int(np.argmin(energy)) * frame + frame // 2
+
+
+def plan_windows(samples, sample_rate, window_seconds=30.0, overlap_seconds=1.0, search_seconds=3.0, frame_ms=30):
+    """(start, end) sample ranges covering samples in overlapping windows."""
+    total = len(samples)
+    window = int(window_seconds * sample_rate)
+    half_overlap = int(overlap_seconds * sample_rate) // 2
+    # each window advances by at least window // 2 - half_overlap samples
+    if overlap_seconds < 0 or window // 2 <= half_overlap:
+        raise ValueError("Windows of %ss cannot overlap by %ss: the overlap must be shorter than the window"
+                         % (window_seconds, overlap_seconds))
+    search = int(search_seconds * sample_rate)
+    frame = max(1, int(sample_rate * frame_ms / 1000))
+    windows = []
+    start = 0
+    while start + window < total:
+        latest = start + window - half_overlap
+        earliest = max(start + window // 2, latest - search)
+        cut = _quietest(samples, earliest, latest, frame)
+        windows.append((start, cut + half_overlap))
+        start = cut - half_overlap
+    windows.append((start, total))
+    return windows
+
+
+def stitch(left, right, max_overlap_words=12):
+    """join two word lists whose ends overlap, keeping the overlapping words once."""
+    if not left or not right:
+        return left + right
+    tail = left[-max_overlap_words:]
+    head = right[:max_overlap_words]
+    match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+    # words around the match are dropped as unaligned copies of the overlap;
+    # a single common word only counts when it sits right at the seam
+    dropped = len(tail) - match.a - match.size + match.b
+    if match.size == 0 or (match.size == 1 and dropped > 2):
+        return left + right
+    return left[:len(left) - len(tail) + match.a] + right[match.b:]
+
+
+def transcribe_windows(samples, windows, transcribe_window, workers=2):
+    """yield transcribe_window(samples[start:end]) for each window, in order."""
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+        for start, end in windows:
+            pending.append(executor.submit(transcribe_window, samples[start:end]))
+            # keep at most workers + 1 windows decoded or queued at once
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def transcribe_long(samples, sample_rate, transcribe_window, window_seconds=30.0, overlap_seconds=1.0,
+                    search_seconds=3.0, workers=2, max_overlap_words=12):
+    """transcribe samples window by window, returns the stitched text."""
+    windows = plan_windows(samples, sample_rate, window_seconds, overlap_seconds, search_seconds)
+    words = []
+    for text in transcribe_windows(samples, windows, transcribe_window, workers):
+        words = stitch(words, text.split(), max_overlap_words)
+    return " ".join(words)
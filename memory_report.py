@@ -0,0 +1,81 @@
+"""
+Memory Report
+-------------
+
+How much memory a pool of worker processes really uses, from
+/proc/<pid>/smaps_rollup (Linux 4.14+).
+
+RSS counts every page a process maps, including the pages it shares with
+other processes, so summing the RSS of workers that share their models
+overstates their footprint. PSS splits each shared page between the
+processes that map it, so the PSS of all processes adds up to the memory
+they actually take. The difference is what private copies of the shared
+pages would have cost on top:
+
+    report = pool_memory([parent_pid] + worker_pids)
+    report["rss_mb"], report["pss_mb"], report["saved_mb"]
+
+On other systems smaps_rollup returns None and the report is empty.
+
+------------------------
+
+"""
+import os
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def smaps_rollup(pid="self"):
+    """{field: kilobytes} of one process, or None where smaps_rollup is not available."""
+    try:
+        with open("/proc/%s/smaps_rollup" % pid) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    memory = {}
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) >= 2 and fields[0].rstrip(":") in FIELDS:
+            memory[fields[0].rstrip(":")] = int(fields[1])
+    return memory
+
+
+def _mb(kilobytes):
+    return round(kilobytes / 1024.0, 1)
+
+
+def pool_memory(pids):
+    """per-process RSS/PSS/shared memory and the totals over pids, in MB."""
+    processes = []
+    for pid in pids:
+        memory = smaps_rollup(pid)
+        if memory is None:
+            continue
+        processes.append({"pid": pid,
+                          "rss_mb": _mb(memory.get("Rss", 0)),
+                          "pss_mb": _mb(memory.get("Pss", 0)),
+                          "shared_mb": _mb(memory.get("Shared_Clean", 0) + memory.get("Shared_Dirty", 0)),
+                          "private_mb": _mb(memory.get("Private_Clean", 0) + memory.get("Private_Dirty", 0))})
+    if not processes:
+        return {}
+    rss = sum(item["rss_mb"] for item in processes)
+    pss = sum(item["pss_mb"] for item in processes)
+    return {"processes": processes, "rss_mb": round(rss, 1), "pss_mb": round(pss, 1),
+            "saved_mb": round(rss - pss, 1)}
+
+
+def children_memory(processes):
+    """pool_memory of this process and the given multiprocessing children."""
+    return pool_memory([os.getpid()] + [process.pid for process in processes])
+
+
+def print_report(report, file=None):
+    if not report:
+        print("Memory report: /proc/<pid>/smaps_rollup is not available", file=file)
+        return
+    print("PID\tRSS MB\tPSS MB\tSHARED\tPRIVATE", file=file)
+    for item in report["processes"]:
+        print("%d\t%.1f\t%.1f\t%.1f\t%.1f" % (item["pid"], item["rss_mb"], item["pss_mb"], item["shared_mb"],
+                                              item["private_mb"]), file=file)
+    print("total: %.1f MB RSS, %.1f MB PSS, %.1f MB saved by sharing"
+          % (report["rss_mb"], report["pss_mb"], report["saved_mb"]), file=file)
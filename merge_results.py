@@ -0,0 +1,95 @@
+"""
+Merge Results
+-------------
+
+Combines the results files of a sharded corpus run (see batch_transcribe.py
+--shard) into one results file and one WER/CER report.
+
+- Items are matched by (mode, engine, language, audio_file); when an item appears
+  more than once (a shard rerun, or overlapping files), a successful record
+  wins over a failed one, and the later of two successful records wins
+- Every item is rescored, so the report does not depend on how the corpus
+  was split
+- With --manifest, the merged file follows the manifest order and items
+  that no shard has finished yet are reported as missing (exit status 1)
+
+Usage:
+
+    python merge_results.py results.*.jsonl --output merged.jsonl --json report.json
+    python merge_results.py results.*.jsonl --manifest corpus.csv
+
+------------------------
+
+"""
+import argparse
+import json
+import sys
+
+from checkpoint import read_results, record_item, record_mode, write_record
+from corpus import item_key, read_manifest
+from scoring import WerAccumulator
+
+
+def merge(paths):
+    """(mode, item key) -> record over every results file, returns (records, duplicates)."""
+    merged = {}
+    duplicates = 0
+    for path in paths:
+        for record in read_results(path):
+            key = (record_mode(record), item_key(record_item(record)))
+            if key in merged:
+                duplicates += 1
+                if record.get("error") is not None:
+                    continue
+            merged[key] = record
+    return merged, duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the results files of a sharded run into one report")
+    parser.add_argument("results", nargs="+", help="results files written by batch_transcribe.py --output")
+    parser.add_argument("--manifest", help="the full manifest, to order the output and find missing items")
+    parser.add_argument("--output", help="write the merged results as JSON lines")
+    parser.add_argument("--json", help="write the summary as JSON")
+    args = parser.parse_args(argv)
+
+    merged, duplicates = merge(args.results)
+    missing = []
+    if args.manifest:
+        modes = sorted({mode for mode, _ in merged}) or ["open"]
+        keys = [(mode, item_key(item)) for mode in modes for item in read_manifest(args.manifest)]
+        missing = [key for key in keys if key not in merged]
+        records = [merged[key] for key in keys if key in merged]
+    else:
+        records = list(merged.values())
+
+    scores = WerAccumulator()
+    failed = 0
+    for record in records:
+        item = record_item(record)
+        if record.get("error") is not None:
+            failed += 1
+        # every mode is reported as an engine of its own
+        mode = record_mode(record)
+        engine = item.engine if mode == "open" else "%s+%s" % (item.engine, mode)
+        score = scores.add(item.reference, record["hypothesis"], item.language, engine)
+        record["WER"] = score["WER"]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for record in records:
+                write_record(out, record)
+    scores.report()
+    counts = {"files": len(args.results), "items": len(records), "failed": failed, "duplicates": duplicates,
+              "missing": len(missing)}
+    print(", ".join("%s=%d" % item for item in counts.items()), file=sys.stderr)
+    for key in missing[:10]:
+        print("missing:", key[0], key[1].replace("\t", " "), file=sys.stderr)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(dict(counts, summary=scores.summary()), f, ensure_ascii=False, indent=2)
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
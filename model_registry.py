@@ -0,0 +1,215 @@
+"""
+Model Registry
+--------------
+
+Process-wide cache of loaded speech models, shared by the DeepSpeech file,
+DeepSpeech microphone and Vosk paths.
+
+- Entries are keyed by (engine, model path, scorer path, decoder settings)
+- Each entry is loaded once and kept warm until evicted
+- Least-recently-used entries are evicted once the memory budget is exceeded
+- Load times and hit/miss counts are kept for reporting
+- Unload listeners are told when a model leaves the registry, so callers
+  holding on to it (e.g. pooled Vosk recognizers) can let go of it too
+
+The memory budget is given in bytes, or through the MODEL_MEMORY_BUDGET_MB
+environment variable for the default registry. The size of an entry is the
+size of its model files on disk, which is a close estimate of what the engine
+keeps resident once loaded.
+
+------------------------
+
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from tracing import tracer
+
+
+def _path_size(path):
+    """size on disk of a model file or a model directory."""
+    if path is None or not os.path.exists(path):
+        return 0
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def _load_deepspeech(model, scorer=None, beam_width=None, lm_alpha=None, lm_beta=None, hot_words=None):
+    from deepspeech import Model
+
+    ds = Model(model)
+    if beam_width is not None:
+        ds.setBeamWidth(beam_width)
+    if scorer is not None:
+        ds.enableExternalScorer(scorer)
+        if lm_alpha is not None and lm_beta is not None:
+            ds.setScorerAlphaBeta(lm_alpha, lm_beta)
+    # hot-words change the model for every caller, so a model with them is
+    # its own registry entry
+    for word, boost in hot_words or ():
+        ds.addHotWord(word, boost)
+    return ds
+
+
+def _load_vosk(model, scorer=None):
+    from vosk import Model
+
+    return Model(model)
+
+
+# engine name -> loader(model, scorer, **settings)
+LOADERS = {
+    "deepspeech": _load_deepspeech,
+    "vosk": _load_vosk,
+}
+
+
+class ModelRegistry:
+    def __init__(self, memory_budget=None):
+        # memory budget in bytes, None means unbounded
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()  # key -> {"model", "size", "load_time"}
+        self._lock = threading.RLock()
+        self._key_locks = {}
+        self._unload_listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+
+    def add_unload_listener(self, listener):
+        """listener(engine, model) is called after a model is unloaded, evicted or cleared."""
+        self._unload_listeners.append(listener)
+
+    def _notify(self, entries):
+        # called without the registry lock held, so listeners may use the registry
+        for key, entry in entries:
+            for listener in self._unload_listeners:
+                listener(key[0], entry["model"])
+
+    @staticmethod
+    def make_key(engine, model, scorer=None, **settings):
+        return (engine, model, scorer, tuple(sorted(settings.items())))
+
+    def get(self, engine, model, scorer=None, **settings):
+        """return a loaded model, loading it on first use."""
+        key = self.make_key(engine, model, scorer, **settings)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry["model"]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside of the registry lock so that other models stay
+        # available while a large graph is being read from disk.
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    return entry["model"]
+                self.misses += 1
+
+            start = time.perf_counter()
+            with tracer.stage("model_load_" + engine):
+                loaded = LOADERS[engine](model, scorer, **settings)
+            elapsed = time.perf_counter() - start
+            size = _path_size(model) + _path_size(scorer)
+
+            with self._lock:
+                self.load_time += elapsed
+                self._entries[key] = {"model": loaded, "size": size, "load_time": elapsed}
+                evicted = self._evict(keep=key)
+            self._notify(evicted)
+            return loaded
+
+    def _evict(self, keep=None):
+        """drop least-recently-used entries over the budget, returns the (key, entry) pairs dropped."""
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        while self.resident_bytes() > self.memory_budget and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            evicted.append((oldest, self._entries.pop(oldest)))
+            self._key_locks.pop(oldest, None)
+            self.evictions += 1
+        return evicted
+
+    def unload(self, engine, model, scorer=None, **settings):
+        """drop a loaded model, returns True when it was resident."""
+        key = self.make_key(engine, model, scorer, **settings)
+        with self._lock:
+            self._key_locks.pop(key, None)
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._notify([(key, entry)])
+        return True
+
+    def is_loaded(self, engine, model, scorer=None, **settings):
+        with self._lock:
+            return self.make_key(engine, model, scorer, **settings) in self._entries
+
+    def set_memory_budget(self, memory_budget):
+        with self._lock:
+            self.memory_budget = memory_budget
+            evicted = self._evict()
+        self._notify(evicted)
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+            self._key_locks.clear()
+        self._notify(entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "loaded": len(self._entries),
+                "resident_bytes": self.resident_bytes(),
+                "load_time": round(self.load_time, 3),
+                "models": [
+                    {"engine": key[0], "model": key[1], "scorer": key[2],
+                     "load_time": round(entry["load_time"], 3), "size": entry["size"]}
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+    def report(self):
+        stats = self.stats()
+        print("Model registry: %d hit(s), %d miss(es), %d eviction(s), %.3fs spent loading"
+              % (stats["hits"], stats["misses"], stats["evictions"], stats["load_time"]))
+        for item in stats["models"]:
+            print("  [%s] %s (%.1f MB, loaded in %.3fs)"
+                  % (item["engine"], item["model"], item["size"] / 2 ** 20, item["load_time"]))
+
+
+def _budget_from_env():
+    budget = os.environ.get("MODEL_MEMORY_BUDGET_MB")
+    if not budget:
+        return None
+    return int(float(budget) * 2 ** 20)
+
+
+# Shared registry used by deepspeech_file, deepspeech_mic and vosk_file
+registry = ModelRegistry(memory_budget=_budget_from_env())
@@ -0,0 +1,118 @@
+"""
+Noise Profile Estimation
+------------------------
+
+Finds the noise sample for noisereduce automatically instead of relying on
+hand-picked (noise_sample_start, noise_sample_end) ranges.
+
+The clip is split into short STFT frames. A per-bin noise floor is estimated
+by minimum statistics (the minimum of the smoothed power over time), and the
+frames whose spectrum sits closest to that floor are taken as the noise
+sample.
+
+- NoiseProfileCache keeps one profile per named audio source (a device or
+  a recording setup shared by many files), so a source is only analysed
+  once; it holds at most max_entries profiles, least recently used first
+  out. Files without a named source are estimated on the spot instead, so a
+  long batch run does not keep a profile per file
+- StreamingDenoiser applies a fixed profile to consecutive chunks, with a
+  little overlap so chunk edges are not audible, without reprocessing the
+  whole clip (the DeepSpeech microphone path uses it)
+
+------------------------
+
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _frames(signal, frame_length, hop_length):
+    count = 1 + (len(signal) - frame_length) // hop_length
+    stride = signal.strides[0]
+    return np.lib.stride_tricks.as_strided(signal, shape=(count, frame_length),
+                                           strides=(hop_length * stride, stride), writeable=False)
+
+
+def estimate_noise(signal, samplerate, frame_ms=32, fraction=0.1, min_seconds=0.25, smoothing=0.85):
+    """return the lowest-energy part of a clip, for use as y_noise."""
+    signal = np.ascontiguousarray(signal, dtype=np.float32)
+    frame_length = int(samplerate * frame_ms / 1000)
+    hop_length = frame_length // 2
+    if len(signal) < 2 * frame_length:
+        return signal
+
+    frames = _frames(signal, frame_length, hop_length)
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_length), axis=1)) ** 2
+
+    # recursive smoothing over time, then the per-bin minimum is the noise floor
+    smoothed = np.empty_like(power)
+    smoothed[0] = power[0]
+    for t in range(1, len(power)):
+        smoothed[t] = smoothing * smoothed[t - 1] + (1 - smoothing) * power[t]
+    floor = smoothed.min(axis=0) + 1e-10
+
+    # frames closest to the floor across all bins are the noisiest-only frames
+    distance = np.mean(np.log(power / floor + 1e-10), axis=1)
+    wanted = max(int(min_seconds * samplerate), int(fraction * len(signal)))
+    count = min(len(frames), max(1, wanted // hop_length))
+    chosen = np.sort(np.argsort(distance)[:count])
+    # the hop-sized start of each chosen frame, so that picks never overlap
+    return np.concatenate([signal[t * hop_length:(t + 1) * hop_length] for t in chosen])
+
+
+class NoiseProfileCache:
+    """noise sample per named audio source (device name, recording setup, ...)."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source, signal=None, samplerate=None, **options):
+        """return the cached profile of a source, estimating it from signal on first use."""
+        with self._lock:
+            profile = self._profiles.get(source)
+            if profile is not None:
+                self._profiles.move_to_end(source)
+        if profile is None and signal is not None:
+            profile = estimate_noise(signal, samplerate, **options)
+            self.set(source, profile)
+        return profile
+
+    def set(self, source, profile):
+        with self._lock:
+            self._profiles[source] = profile
+            self._profiles.move_to_end(source)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+class StreamingDenoiser:
+    """stationary noise reduction of consecutive chunks against a fixed profile."""
+
+    def __init__(self, profile, samplerate, context_seconds=0.1):
+        import noisereduce as nr
+
+        self._reduce = nr.reduce_noise
+        self.profile = profile
+        self.samplerate = samplerate
+        self.context = int(context_seconds * samplerate)
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, chunk):
+        """denoise one float chunk, returns the same number of samples."""
+        chunk = np.asarray(chunk, dtype=np.float32)
+        padded = np.concatenate((self._tail, chunk))
+        cleaned = self._reduce(y=padded, y_noise=self.profile, sr=self.samplerate, stationary=True)
+        self._tail = padded[-self.context:] if self.context else self._tail
+        return cleaned[len(padded) - len(chunk):]
+
+
+# Shared cache used by the DeepSpeech recognizer and microphone
+noise_profiles = NoiseProfileCache()
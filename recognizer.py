@@ -0,0 +1,654 @@
+"""
+Recognizer
+----------
+
+One interface over every speech engine, so caching, batching, streaming and
+metrics are written once and apply to all of them.
+
+    recognizer = create_recognizer("vosk", "spanish")
+    text = recognizer.transcribe_file("spanish/Voice/checkin_es.wav")
+    for kind, text in recognizer.transcribe_stream(blocks):   # "partial" / "final"
+        ...
+    detailed = recognizer.transcribe_detailed(audio_file, alternatives=3)
+    for text in recognizer.transcribe_batch(audio_files):
+        ...
+
+Backends are registered by name in BACKENDS:
+
+- "vosk": Vosk KaldiRecognizer over the shared per-language Model
+- "deepspeech": DeepSpeech Model with its external scorer and noise reduction
+- "auto": identifies the language from the first seconds of audio and
+  routes the rest to that language's Vosk model
+- "stub": deterministic fake engine with no models or audio, for testing
+  the pipeline offline ("fake" is an alias)
+
+Models are loaded through the shared model registry, and audio through the
+shared audio cache.
+
+create_recognizer(engine, language, domain=True) decodes against the domain
+phrases only (see grammar.py): a Vosk grammar, or DeepSpeech hot-words.
+
+------------------------
+
+"""
+import itertools
+import json
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_cache import load_audio, to_float
+from corpus import evaluation_lists, noise_ranges
+from grammar import HOT_WORD_BOOST, hot_words, vosk_grammar
+from language_models import LanguageModels
+from longform import transcribe_long
+from model_registry import registry
+from noise_profile import estimate_noise, noise_profiles
+from tracing import tracer
+from word_timings import Alternative, DetailedTranscript, Word, from_deepspeech_metadata, from_vosk_results
+
+# Sample rate files are decoded at. Both engines use 16 kHz so they share the
+# same cached audio.
+SAMPLE_RATE = 16000
+
+VOSK_MODELS = {"english": "english/small-en-us-0.15",
+               "italian": "italian/small-it-0.22",
+               "spanish": "spanish/small-es-0.42"}
+
+DEEPSPEECH_MODELS = {"english": ("english/deepspeech-0.9.3-models.pbmm", "english/deepspeech-0.9.3-models.scorer"),
+                     "italian": ("italian/output_graph_it.pbmm", "italian/kenlm_it.scorer"),
+                     "spanish": ("spanish/output_graph_es.pbmm", "spanish/kenlm_es.scorer")}
+
+# Long DeepSpeech recordings estimate their noise profile from this much
+# leading audio, so the estimate stays bounded like the decoding does.
+NOISE_PROFILE_SECONDS = 30
+
+# engine name -> Recognizer subclass
+BACKENDS = {}
+
+
+def register_backend(*names):
+    """class decorator adding a Recognizer subclass to BACKENDS."""
+    def register(cls):
+        for name in names:
+            BACKENDS[name] = cls
+        return cls
+    return register
+
+
+def create_recognizer(engine, language, **options):
+    if engine not in BACKENDS:
+        raise KeyError("Unknown engine: %s (available: %s)" % (engine, ", ".join(sorted(BACKENDS))))
+    return BACKENDS[engine](language, **options)
+
+
+class Recognizer:
+    """common interface of every engine backend."""
+
+    name = None
+    sample_rate = SAMPLE_RATE
+    # whether results may be kept in the result cache
+    cacheable = True
+    # whether a model loaded before fork() keeps working in the child, so
+    # pool workers can share the parent's copy
+    fork_safe = False
+
+    def __init__(self, language):
+        self.language = language
+
+    def load(self):
+        """return the (warm) engine model for this recognizer's language."""
+        raise NotImplementedError
+
+    def model_files(self):
+        """model files and directories whose content determines the results."""
+        return []
+
+    def settings(self, audio_file, **options):
+        """decoding parameters that affect the text transcribe_file returns."""
+        return {"sample_rate": self.sample_rate}
+
+    def transcribe_file(self, audio_file):
+        """transcribe a whole file, returns its text."""
+        raise NotImplementedError
+
+    def transcribe_stream(self, blocks):
+        """transcribe an iterable of int16 blocks, yields ("partial"|"final", text)."""
+        raise NotImplementedError
+
+    def transcribe_detailed(self, audio_file, alternatives=0):
+        """transcribe a file with word timings, confidences and up to `alternatives` N-best
+        texts from the same decoding pass, returns a word_timings.DetailedTranscript."""
+        raise NotImplementedError
+
+    def transcribe_channels(self, audio_file, workers=None):
+        """transcribe each channel of a recording (e.g. each side of a call) in parallel."""
+        from ingestion import transcribe_channels
+
+        return transcribe_channels(self, audio_file, workers)
+
+    def transcribe_batch(self, audio_files, processes=None):
+        """transcribe many files over a process pool, yields texts in input order.
+
+        Every worker gets a copy of this recognizer, settings and all.
+        """
+        from batch_transcribe import transcribe_batch
+        from corpus import ManifestItem
+
+        manifest = [ManifestItem("", audio_file, self.language, self.name) for audio_file in audio_files]
+        for result in transcribe_batch(manifest, processes, recognizers=[self]):
+            yield result.hypothesis
+
+
+class RecognizerPool:
+    """idle KaldiRecognizers over one Vosk Model and sample rate.
+
+    Released recognizers are reset and handed out again, so a new session
+    costs a Reset() instead of building a recognizer. Every recognizer in the
+    pool shares the one Model; if the registry has since reloaded that model,
+    the stale recognizers are dropped, and when the registry unloads or
+    evicts it, forget() lets go of it so it can really be freed.
+    """
+
+    def __init__(self, load_model, sample_rate, max_idle=32, grammar=None):
+        self.load_model = load_model
+        self.sample_rate = sample_rate
+        self.max_idle = max_idle
+        self.grammar = grammar
+        self._model = None
+        self._idle = []
+        # id of each recognizer handed out -> the model it was built on
+        self._in_use = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self):
+        model = self.load_model()
+        with self._lock:
+            if model is not self._model:
+                self._idle.clear()
+                self._model = model
+            if self._idle:
+                self.reused += 1
+                rec = self._idle.pop()
+                self._in_use[id(rec)] = model
+                return rec
+            self.created += 1
+        from vosk import KaldiRecognizer
+
+        if self.grammar is not None:
+            rec = KaldiRecognizer(model, self.sample_rate, self.grammar)
+        else:
+            rec = KaldiRecognizer(model, self.sample_rate)
+        with self._lock:
+            self._in_use[id(rec)] = model
+        return rec
+
+    def release(self, rec):
+        rec.Reset()
+        with self._lock:
+            model = self._in_use.pop(id(rec), None)
+            # a recognizer of a model reloaded or unloaded meanwhile is not kept
+            if len(self._idle) < self.max_idle and model is not None and model is self._model:
+                self._idle.append(rec)
+
+    def forget(self, model):
+        """drop the idle recognizers of model, which has left the registry."""
+        with self._lock:
+            if model is self._model:
+                self._idle.clear()
+                self._model = None
+
+    def stats(self):
+        with self._lock:
+            return {"created": self.created, "reused": self.reused, "idle": len(self._idle)}
+
+
+@register_backend("vosk")
+class VoskRecognizer(Recognizer):
+    name = "vosk"
+    fork_safe = True
+    # Models are loaded on first use, so serving a single language only pays
+    # for that language. Long-running entry points unload a model after
+    # VOSK_IDLE_TIMEOUT seconds without use (see language_models.py).
+    language_models = LanguageModels("vosk", VOSK_MODELS)
+    # (language, sample rate, grammar) -> RecognizerPool, shared by every instance
+    pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, language, chunk_frames=4000, max_chunk_frames=32000, sample_rate=SAMPLE_RATE,
+                 domain=False, phrases=None):
+        # domain=True decodes against a grammar of the domain phrases only
+        super().__init__(language)
+        self.chunk_frames = chunk_frames
+        self.max_chunk_frames = max_chunk_frames
+        self.sample_rate = sample_rate
+        self.grammar = vosk_grammar(language, phrases) if domain else None
+
+    def load(self):
+        return self.language_models.get(self.language)
+
+    def model_files(self):
+        return [VOSK_MODELS[self.language]]
+
+    def settings(self, audio_file, **options):
+        return {"sample_rate": self.sample_rate, "chunk_frames": self.chunk_frames,
+                "max_chunk_frames": self.max_chunk_frames, "grammar": self.grammar}
+
+    @classmethod
+    def forget_model(cls, engine, model):
+        """registry unload listener, so idle recognizers do not keep an unloaded model alive."""
+        if engine != "vosk":
+            return
+        with cls._pools_lock:
+            pools = list(cls.pools.values())
+        for pool in pools:
+            pool.forget(model)
+
+    def pool(self):
+        key = (self.language, self.sample_rate, self.grammar)
+        with self._pools_lock:
+            if key not in self.pools:
+                self.pools[key] = RecognizerPool(self.load, self.sample_rate, grammar=self.grammar)
+            return self.pools[key]
+
+    def decode(self, audio, chunk_frames=None, max_chunk_frames=None):
+        """run int16 samples through a pooled KaldiRecognizer, returns the joined text.
+
+        Chunks start at chunk_frames and double while the recognizer is inside
+        a segment (up to max_chunk_frames), which cuts the per-call overhead on
+        long files; they drop back to chunk_frames after each segment boundary.
+        Pass max_chunk_frames=chunk_frames for fixed-size chunks.
+        """
+        chunk_frames = chunk_frames or self.chunk_frames
+        max_chunk_frames = max_chunk_frames or self.max_chunk_frames
+        pool = self.pool()
+        rec = pool.acquire()
+        try:
+            text = ""
+            size = chunk_frames
+            start = 0
+            while start < len(audio):
+                data = audio[start:start + size].tobytes()
+                start += size
+                if rec.AcceptWaveform(data):
+                    # JSON is only parsed at segment boundaries
+                    jres = json.loads(rec.Result())
+                    text = text + " " + jres["text"]
+                    size = chunk_frames
+                else:
+                    size = min(size * 2, max_chunk_frames)
+            jres = json.loads(rec.FinalResult())
+            text = text + " " + jres["text"]
+            return text
+        finally:
+            pool.release(rec)
+
+    def transcribe_file(self, audio_file):
+        with tracer.utterance(audio_file):
+            with tracer.stage("audio_load"):
+                # Any format is accepted, the audio cache decodes and resamples
+                # it once and hands back a memory-mapped array
+                audio = load_audio(audio_file, self.sample_rate)
+            with tracer.stage("decode"):
+                return self.decode(audio)
+
+    def transcribe_detailed(self, audio_file, alternatives=0):
+        with tracer.utterance(audio_file):
+            with tracer.stage("audio_load"):
+                audio = load_audio(audio_file, self.sample_rate)
+            with tracer.stage("decode"):
+                pool = self.pool()
+                rec = pool.acquire()
+                rec.SetWords(True)
+                if alternatives:
+                    rec.SetMaxAlternatives(alternatives)
+                try:
+                    results = []
+                    for start in range(0, len(audio), self.max_chunk_frames):
+                        if rec.AcceptWaveform(audio[start:start + self.max_chunk_frames].tobytes()):
+                            results.append(json.loads(rec.Result()))
+                    results.append(json.loads(rec.FinalResult()))
+                finally:
+                    # pooled recognizers go back with the default output
+                    rec.SetWords(False)
+                    rec.SetMaxAlternatives(0)
+                    pool.release(rec)
+        return from_vosk_results(results)
+
+    def confidence(self, samples):
+        """(mean word confidence, text) of a short clip, for language identification."""
+        pool = self.pool()
+        rec = pool.acquire()
+        rec.SetWords(True)
+        try:
+            rec.AcceptWaveform(np.asarray(samples, dtype=np.int16).tobytes())
+            result = json.loads(rec.FinalResult())
+        finally:
+            rec.SetWords(False)
+            pool.release(rec)
+        words = result.get("result", [])
+        if not words:
+            return 0.0, ""
+        return sum(word["conf"] for word in words) / len(words), result["text"]
+
+    def transcribe_stream(self, blocks):
+        pool = self.pool()
+        rec = pool.acquire()
+        try:
+            last_partial = ""
+            for block in blocks:
+                if rec.AcceptWaveform(np.asarray(block, dtype=np.int16).tobytes()):
+                    yield "final", json.loads(rec.Result())["text"]
+                    last_partial = ""
+                else:
+                    partial = json.loads(rec.PartialResult())["partial"]
+                    if partial != last_partial:
+                        yield "partial", partial
+                        last_partial = partial
+            yield "final", json.loads(rec.FinalResult())["text"]
+        finally:
+            pool.release(rec)
+
+
+registry.add_unload_listener(VoskRecognizer.forget_model)
+
+
+@register_backend("auto")
+class AutoRecognizer(Recognizer):
+    """Vosk with automatic language identification.
+
+    Every language's model decodes just the first probe_seconds of the audio,
+    in parallel, and the rest goes only to the language whose words came out
+    with the highest mean confidence.
+    """
+
+    name = "auto"
+    fork_safe = True
+
+    def __init__(self, language=None, languages=None, probe_seconds=3.0, sample_rate=SAMPLE_RATE, domain=False,
+                 phrases=None):
+        # language is ignored, it is what this recognizer finds out; phrases,
+        # if given, are the domain phrases of every language
+        super().__init__(language)
+        self.languages = languages or sorted(VOSK_MODELS)
+        self.probe_seconds = probe_seconds
+        self.sample_rate = sample_rate
+        self.domain = domain
+        self.phrases = tuple(phrases) if phrases is not None else None
+        self.recognizers = {language: VoskRecognizer(language, sample_rate=sample_rate, domain=domain,
+                                                     phrases=phrases)
+                            for language in self.languages}
+
+    def load(self):
+        return [recognizer.load() for recognizer in self.recognizers.values()]
+
+    def model_files(self):
+        return [VOSK_MODELS[language] for language in self.languages]
+
+    def settings(self, audio_file, **options):
+        return {"sample_rate": self.sample_rate, "languages": self.languages, "probe_seconds": self.probe_seconds,
+                "domain": self.domain, "phrases": self.phrases if self.domain else None}
+
+    def scores(self, samples):
+        """language -> (mean word confidence, text) over the probe window of samples."""
+        probe = samples[:int(self.probe_seconds * self.sample_rate)]
+        with tracer.stage("language_id"):
+            with ThreadPoolExecutor(len(self.recognizers)) as executor:
+                results = executor.map(lambda recognizer: recognizer.confidence(probe), self.recognizers.values())
+                return dict(zip(self.recognizers, results))
+
+    def best(self, scores):
+        # more recognised words breaks ties, e.g. when every model is unsure
+        return max(self.languages, key=lambda language: (scores[language][0], len(scores[language][1].split())))
+
+    def identify(self, samples):
+        return self.best(self.scores(samples))
+
+    def detect(self, blocks):
+        """read the probe window off an iterator of blocks, returns (language, blocks read)."""
+        needed = int(self.probe_seconds * self.sample_rate)
+        buffered = []
+        total = 0
+        for block in blocks:
+            # copied, since capture buffers recycle their blocks
+            buffered.append(np.array(block, dtype=np.int16))
+            total += len(block)
+            if total >= needed:
+                break
+        samples = np.concatenate(buffered) if buffered else np.zeros(0, dtype=np.int16)
+        return self.identify(samples), buffered
+
+    def transcribe_file(self, audio_file):
+        samples = load_audio(audio_file, self.sample_rate)
+        return self.recognizers[self.identify(samples)].transcribe_file(audio_file)
+
+    def transcribe_detailed(self, audio_file, alternatives=0):
+        samples = load_audio(audio_file, self.sample_rate)
+        return self.recognizers[self.identify(samples)].transcribe_detailed(audio_file, alternatives)
+
+    def transcribe_stream(self, blocks):
+        """as Recognizer.transcribe_stream, led by a ("language", language) item."""
+        blocks = iter(blocks)
+        language, buffered = self.detect(blocks)
+        yield "language", language
+        yield from self.recognizers[language].transcribe_stream(itertools.chain(buffered, blocks))
+
+
+@register_backend("deepspeech")
+class DeepSpeechRecognizer(Recognizer):
+    name = "deepspeech"
+    language_models = LanguageModels("deepspeech", DEEPSPEECH_MODELS)
+
+    def __init__(self, language=None, model=None, scorer=None, denoise=True, partial_seconds=0.5,
+                 long_form_seconds=60, window_seconds=30, overlap_seconds=1.0, long_form_workers=2,
+                 domain=False, phrases=None, hot_word_boost=HOT_WORD_BOOST):
+        # an explicit model/scorer pair overrides the per-language defaults;
+        # files longer than long_form_seconds are decoded in windows;
+        # domain=True boosts the domain phrases' words by hot_word_boost
+        super().__init__(language)
+        self.model = model
+        self.scorer = scorer
+        self.denoise = denoise
+        self.partial_seconds = partial_seconds
+        self.long_form_seconds = long_form_seconds
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.long_form_workers = long_form_workers
+        self.hot_words = hot_words(language, phrases, hot_word_boost) if domain else None
+
+    def load(self):
+        settings = {"hot_words": self.hot_words} if self.hot_words else {}
+        if self.model is not None:
+            return registry.get("deepspeech", self.model, self.scorer, **settings)
+        return self.language_models.get(self.language, **settings)
+
+    def model_files(self):
+        if self.model is not None:
+            return [path for path in (self.model, self.scorer) if path]
+        return list(DEEPSPEECH_MODELS[self.language])
+
+    def noise_range(self, audio_file, noise_range=None):
+        """the noise sample range used for a file, (None, None) to estimate one."""
+        return tuple(noise_range or noise_ranges.get(audio_file, (None, None)))
+
+    def settings(self, audio_file, noise_range=None, noise_source=None):
+        settings = {"denoise": self.denoise, "hot_words": self.hot_words,
+                    "long_form": (self.long_form_seconds, self.window_seconds, self.overlap_seconds)}
+        if self.denoise:
+            settings["noise_range"] = self.noise_range(audio_file, noise_range)
+            settings["noise_source"] = noise_source
+        return settings
+
+    def transcribe_file(self, audio_file, noise_range=None, noise_source=None):
+        """transcribe a file after noise reduction.
+
+        noise_range is a (start, end) sample range holding only noise. Without
+        one (or with an empty one) the noise profile is estimated from the
+        file, and cached per noise_source when one is named. Files longer than
+        long_form_seconds are transcribed window by window (see longform.py).
+        """
+        with tracer.utterance(audio_file):
+            #Model Declaration (loaded once, then served warm by the registry)
+            with tracer.stage("model_load"):
+                ds = self.load()
+
+            #Sample Rate
+            desired_sample_rate = ds.sampleRate()
+
+            #Load audio (decoded and resampled once, then served from the audio cache)
+            with tracer.stage("audio_load"):
+                samples = load_audio(audio_file, desired_sample_rate)
+            if self.long_form_seconds and len(samples) > self.long_form_seconds * desired_sample_rate:
+                return self.transcribe_long(ds, samples, audio_file, noise_range, noise_source)
+            audio = self.denoised(samples, desired_sample_rate, audio_file, noise_range, noise_source)
+            with tracer.stage("decode"):
+                return ds.stt(audio)
+
+    @staticmethod
+    def _profile(raw, sample_rate, noise_source):
+        # only named sources are cached: a profile per file would grow with
+        # the corpus, and each file is estimated once per decode anyway
+        if noise_source is None:
+            return estimate_noise(raw, sample_rate)
+        return noise_profiles.get(noise_source, raw, sample_rate)
+
+    def denoised(self, samples, sample_rate, audio_file, noise_range=None, noise_source=None):
+        """int16 samples after noise reduction, or unchanged when denoise is off."""
+        if not self.denoise:
+            return samples
+        raw = to_float(samples)
+        noise_sample_start, noise_sample_end = self.noise_range(audio_file, noise_range)
+        with tracer.stage("noise_estimate"):
+            if noise_sample_start is not None and noise_sample_end is not None and noise_sample_end > noise_sample_start:
+                noisy_part = raw[noise_sample_start:noise_sample_end]
+            else:
+                noisy_part = self._profile(raw, sample_rate, noise_source)
+        # perform noise reduction
+        with tracer.stage("denoise"):
+            import noisereduce as nr
+
+            audio = nr.reduce_noise(y=raw, y_noise=noisy_part, sr=sample_rate)
+
+        with tracer.stage("int16_convert"):
+            return (audio * 32767).astype(np.int16)  # scale from -1 to 1 to +/-32767
+
+    def transcribe_detailed(self, audio_file, alternatives=0, noise_range=None, noise_source=None):
+        """DetailedTranscript from sttWithMetadata, in one pass over the whole file."""
+        with tracer.utterance(audio_file):
+            with tracer.stage("model_load"):
+                ds = self.load()
+            with tracer.stage("audio_load"):
+                samples = load_audio(audio_file, ds.sampleRate())
+            audio = self.denoised(samples, ds.sampleRate(), audio_file, noise_range, noise_source)
+            with tracer.stage("decode"):
+                metadata = ds.sttWithMetadata(audio, max(1, alternatives))
+        return from_deepspeech_metadata(metadata, len(audio) / float(ds.sampleRate()))
+
+    def transcribe_long(self, ds, samples, audio_file, noise_range=None, noise_source=None):
+        """decode samples in overlapping windows, denoising each against one profile."""
+        sample_rate = ds.sampleRate()
+        profile = None
+        if self.denoise:
+            noise_sample_start, noise_sample_end = self.noise_range(audio_file, noise_range)
+            with tracer.stage("noise_estimate"):
+                if noise_sample_start is not None and noise_sample_end is not None and noise_sample_end > noise_sample_start:
+                    profile = to_float(samples[noise_sample_start:noise_sample_end])
+                else:
+                    head = to_float(samples[:NOISE_PROFILE_SECONDS * sample_rate])
+                    profile = self._profile(head, sample_rate, noise_source)
+
+        def transcribe_window(window):
+            if profile is not None:
+                import noisereduce as nr
+
+                with tracer.stage("denoise"):
+                    cleaned = nr.reduce_noise(y=to_float(window), y_noise=profile, sr=sample_rate)
+                    window = (cleaned * 32767).astype(np.int16)
+            with tracer.stage("decode"):
+                return ds.stt(window)
+
+        with tracer.stage("long_form"):
+            return transcribe_long(samples, sample_rate, transcribe_window, self.window_seconds,
+                                   self.overlap_seconds, workers=self.long_form_workers)
+
+    def transcribe_stream(self, blocks):
+        ds = self.load()
+        partial_every = int(self.partial_seconds * ds.sampleRate())
+        stream = ds.createStream()
+        fed = 0
+        last_partial = ""
+        for block in blocks:
+            stream.feedAudioContent(np.asarray(block, dtype=np.int16))
+            fed += len(block)
+            if fed >= partial_every:
+                fed = 0
+                partial = stream.intermediateDecode()
+                if partial != last_partial:
+                    yield "partial", partial
+                    last_partial = partial
+        yield "final", stream.finishStream()
+
+
+@register_backend("stub", "fake")
+class StubRecognizer(Recognizer):
+    """deterministic stand-in engine needing no models or audio.
+
+    Known files (the evaluation lists, plus anything added with
+    add_references) come back as their reference with every Nth word dropped;
+    unknown files get a fixed pseudo-transcript derived from the file name.
+    Streams produce one word per second of audio.
+    """
+
+    name = "stub"
+    fork_safe = True
+    # results depend on the file name only, and the file may not even exist
+    cacheable = False
+    references = {audio_file: reference
+                  for file_list in evaluation_lists.values() for reference, audio_file in file_list}
+
+    def __init__(self, language, drop_every=5, seconds_per_word=0.4, domain=False, phrases=None):
+        # domain decoding has no effect on the stub
+        super().__init__(language)
+        self.drop_every = drop_every
+        self.seconds_per_word = seconds_per_word
+
+    @classmethod
+    def add_references(cls, manifest):
+        for item in manifest:
+            cls.references[item.audio_file] = item.reference
+
+    def load(self):
+        return None
+
+    def duration(self, audio_file):
+        return len(self._words(audio_file)) * self.seconds_per_word
+
+    def _words(self, audio_file):
+        if audio_file in self.references:
+            return self.references[audio_file].split()
+        seed = zlib.crc32(audio_file.encode("utf-8"))
+        return ["stub%d" % ((seed >> shift) & 0xff) for shift in range(0, 32, 8)]
+
+    def transcribe_file(self, audio_file):
+        words = self._words(audio_file)
+        return " ".join(word for i, word in enumerate(words, 1) if i % self.drop_every)
+
+    def transcribe_detailed(self, audio_file, alternatives=0):
+        text = self.transcribe_file(audio_file)
+        words = [Word(word, i * self.seconds_per_word, (i + 1) * self.seconds_per_word, 1.0, 0)
+                 for i, word in enumerate(text.split())]
+        return DetailedTranscript(text, words, [Alternative(0, 0, 1.0, text)])
+
+    def transcribe_stream(self, blocks):
+        samples = 0
+        words = []
+        for block in blocks:
+            samples += len(block)
+            while len(words) < samples // self.sample_rate:
+                words.append("stub%d" % len(words))
+                yield "partial", " ".join(words)
+        yield "final", " ".join(words)
@@ -0,0 +1,191 @@
+"""
+Result Cache
+------------
+
+Persistent cache of transcriptions, so re-running an evaluation over
+unchanged audio and models only costs a lookup per file.
+
+A result is keyed by
+
+- the content hash of the audio file
+- the engine and the content hashes of its model (and scorer) files
+- the recognizer's decoding settings, including DeepSpeech's noise
+  reduction range and noise source
+
+so editing a recording, swapping a model or changing a parameter never
+returns a stale transcript. File hashes are themselves remembered in the
+store by (path, size, mtime), so a warm run does not even re-read the audio.
+Model hashes are worked out once per process: a model directory is only
+walked for the first key of a recognizer, and a process keeps using the
+model it loaded even if the files change on disk.
+
+The store is a SQLite database (.result_cache.sqlite, or RESULT_CACHE_PATH)
+in WAL mode, safe to share between the processes of a batch run. When it
+grows past RESULT_CACHE_MAX_MB (default 512) the least recently used results
+are evicted. RESULT_CACHE=0 disables the cache.
+
+    text = result_cache.transcribe(recognizer, "english/Voice/checkin.wav")
+
+------------------------
+
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from audio_cache import file_hash as _content_hash
+from tracing import tracer
+
+# bytes counted per row on top of the text, for the key and bookkeeping
+_ROW_OVERHEAD = 96
+
+
+class ResultCache:
+    def __init__(self, path, max_bytes=None, enabled=True, check_every=100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.check_every = check_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        # model files -> their hashes, for this process
+        self._model_hashes = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # one connection per thread, and a new one after a fork
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, text TEXT, size INTEGER,"
+                       " created REAL, last_used REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+            db.execute("CREATE TABLE IF NOT EXISTS file_hashes (path TEXT PRIMARY KEY, size INTEGER,"
+                       " mtime_ns INTEGER, digest TEXT)")
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def file_hash(self, path):
+        """content hash of a file, or of every file under a directory."""
+        if os.path.isdir(path):
+            sha1 = hashlib.sha1()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    sha1.update(os.path.relpath(full, path).encode("utf-8"))
+                    sha1.update(self.file_hash(full).encode("ascii"))
+            return sha1.hexdigest()
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        db = self._db()
+        row = db.execute("SELECT digest FROM file_hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                         (path, stat.st_size, stat.st_mtime_ns)).fetchone()
+        if row:
+            return row[0]
+        digest = _content_hash(path)
+        db.execute("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?)",
+                   (path, stat.st_size, stat.st_mtime_ns, digest))
+        return digest
+
+    def model_hashes(self, recognizer):
+        """content hashes of a recognizer's model files, worked out once per process."""
+        files = tuple(recognizer.model_files())
+        hashes = self._model_hashes.get(files)
+        if hashes is None:
+            hashes = [self.file_hash(path) for path in files]
+            with self._lock:
+                self._model_hashes[files] = hashes
+        return hashes
+
+    def key(self, recognizer, audio_file, **options):
+        record = {"engine": recognizer.name,
+                  "audio": self.file_hash(audio_file),
+                  "models": self.model_hashes(recognizer),
+                  "settings": recognizer.settings(audio_file, **options)}
+        return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        db = self._db()
+        row = db.execute("SELECT text FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        db.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key, text):
+        now = time.time()
+        size = len(text.encode("utf-8")) + _ROW_OVERHEAD
+        self._db().execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (key, text, size, now, now))
+        with self._lock:
+            self._puts += 1
+            check = self._puts % self.check_every == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """drop least recently used results until the store fits in max_bytes."""
+        if not self.max_bytes:
+            return 0
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        evicted = 0
+        while total > self.max_bytes:
+            rows = db.execute("SELECT key, size FROM results ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                break
+            db.execute("DELETE FROM results WHERE key IN (%s)" % ",".join("?" * len(rows)),
+                       [row[0] for row in rows])
+            total -= sum(row[1] for row in rows)
+            evicted += len(rows)
+        with self._lock:
+            self.evictions += evicted
+        return evicted
+
+    def transcribe(self, recognizer, audio_file, **options):
+        """recognizer.transcribe_file(audio_file, **options), served from the cache when possible."""
+        if not self.enabled or not recognizer.cacheable:
+            return recognizer.transcribe_file(audio_file, **options)
+        with tracer.stage("result_cache"):
+            key = self.key(recognizer, audio_file, **options)
+            text = self.get(key)
+        if text is not None:
+            tracer.count("result_cache_hits")
+            return text
+        text = recognizer.transcribe_file(audio_file, **options)
+        if text is not None:
+            self.put(key, text)
+        return text
+
+    def clear(self):
+        self._db().execute("DELETE FROM results")
+
+    def stats(self):
+        db = self._db()
+        entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": entries, "bytes": size}
+
+
+def _from_env():
+    max_mb = float(os.environ.get("RESULT_CACHE_MAX_MB", "512"))
+    return ResultCache(os.environ.get("RESULT_CACHE_PATH", ".result_cache.sqlite"),
+                       max_bytes=int(max_mb * 2 ** 20) if max_mb else None,
+                       enabled=os.environ.get("RESULT_CACHE", "1") != "0")
+
+
+result_cache = _from_env()
@@ -0,0 +1,118 @@
+"""
+Ring Buffer
+-----------
+
+Preallocated single-producer / single-consumer sample buffer for microphone
+capture.
+
+The audio callback (producer) copies each block into a fixed NumPy array and
+the recognizer loop (consumer) receives views into that same array, so no
+per-sample Python objects are created and memory stays constant however long
+the session runs.
+
+- The producer only advances the write counter and never blocks or waits
+- The consumer only advances the read counter
+- If the consumer falls more than `capacity` samples behind, the oldest
+  audio is skipped and counted as an overrun
+
+Views returned by read() stay valid until the producer has written another
+`capacity` samples, so they should be handed to the recognizer straight away
+(or copied when they must be kept).
+
+------------------------
+
+"""
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.int16):
+        self.capacity = int(capacity)
+        self._buffer = np.zeros(self.capacity, dtype=dtype)
+        # Monotonic sample counters. Each is only ever written by one side,
+        # and a Python int assignment is atomic, so no lock is needed.
+        self._written = 0
+        self._read = 0
+        self._data_ready = threading.Event()
+        self.overruns = 0
+        self.dropped = 0
+
+    @classmethod
+    def for_duration(cls, seconds, samplerate, dtype=np.int16):
+        """buffer holding at most `seconds` of audio (the maximum retention)."""
+        return cls(int(seconds * samplerate), dtype)
+
+    def write(self, block):
+        """copy a block of samples in, called from the audio callback."""
+        total = len(block)
+        # Sample k always lives at index k % capacity; a block longer than the
+        # buffer only keeps its tail, the consumer sees the rest as an overrun.
+        skipped = max(0, total - self.capacity)
+        block = block[skipped:]
+        n = total - skipped
+        start = (self._written + skipped) % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = block[:first]
+        if first < n:
+            self._buffer[:n - first] = block[first:]
+        # Publish only once the samples are in place
+        self._written += total
+        self._data_ready.set()
+
+    def available(self):
+        return min(self._written - self._read, self.capacity)
+
+    def read(self, max_samples=None):
+        """return a zero-copy view of the oldest unread samples (may be empty).
+
+        A view never wraps around the end of the buffer, so a second call may
+        be needed to drain everything that is available.
+        """
+        written = self._written
+        behind = written - self._read
+        if behind > self.capacity:
+            self.overruns += 1
+            self.dropped += behind - self.capacity
+            self._read = written - self.capacity
+            behind = self.capacity
+        start = self._read % self.capacity
+        n = min(behind, self.capacity - start)
+        if max_samples is not None:
+            n = min(n, max_samples)
+        self._read += n
+        if self._read == self._written:
+            self._data_ready.clear()
+            # the producer may have published between the check and the clear
+            if self._read != self._written:
+                self._data_ready.set()
+        return self._buffer[start:start + n]
+
+    def read_exactly(self, samples, timeout=None):
+        """wait for `samples` samples and return them as a view, or None on timeout.
+
+        Falls back to a copy only when the requested block wraps around the
+        end of the buffer.
+        """
+        while self.available() < samples:
+            # some samples arrived but not enough yet, wait for the next write
+            self._data_ready.clear()
+            if self.available() >= samples:
+                break
+            if not self.wait(timeout):
+                return None
+        # read() skips overwritten samples first, so only its result tells
+        # whether the block wrapped around the end of the buffer
+        head = self.read(samples)
+        if len(head) == samples:
+            return head
+        return np.concatenate((head, self.read(samples - len(head))))
+
+    def wait(self, timeout=None):
+        """block the consumer until new samples arrive, returns False on timeout."""
+        return self._data_ready.wait(timeout)
+
+    def stats(self):
+        return {"capacity": self.capacity, "written": self._written, "read": self._read,
+                "overruns": self.overruns, "dropped": self.dropped}
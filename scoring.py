@@ -0,0 +1,336 @@
+"""
+Word Error Rate
+---------------
+
+Shared WER scoring for the Vosk and DeepSpeech scripts.
+
+Words are mapped to integer ids and the Levenshtein distance is computed
+with the bit-parallel algorithm of Myers (1999) in the formulation of
+Hyyrö (2001). Each hypothesis word updates one column of the edit distance
+table as a pair of bit vectors (Python integers, so there is no limit on the
+reference length), which replaces the interpreted cell-by-cell double loop.
+
+The substitution/insertion/deletion breakdown is recovered by walking back
+through the stored column bit vectors with the same tie-breaking as the
+original table-based implementation (substitution, then insertion, then
+deletion), so the counts match it exactly. The printable alignment is only
+built when it is asked for.
+
+WerAccumulator aggregates utterance scores into corpus WER and CER, overall
+and per language / engine. It only keeps running sums, so its memory does
+not grow with the number of utterances scored.
+
+------------------------
+
+"""
+import math
+
+from tracing import tracer
+
+OP_OK = 0
+OP_SUB = 1
+OP_INS = 2
+OP_DEL = 3
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value):
+        return bin(value).count("1")
+
+
+def _to_ids(r, h):
+    vocabulary = {}
+    r_ids = [vocabulary.setdefault(word, len(vocabulary)) for word in r]
+    h_ids = [vocabulary.setdefault(word, len(vocabulary)) for word in h]
+    return r_ids, h_ids
+
+
+def _columns(r_ids, h_ids, keep_columns=True):
+    """bit-parallel edit distance, optionally keeping every column's vertical deltas.
+
+    Bit i of pv (mv) is set when D[i+1][j] - D[i][j] is +1 (-1).
+    """
+    n = len(r_ids)
+    mask = (1 << n) - 1
+    top = 1 << (n - 1)
+
+    peq = {}
+    for i, word in enumerate(r_ids):
+        peq[word] = peq.get(word, 0) | (1 << i)
+
+    pv = mask
+    mv = 0
+    score = n
+    columns = [(pv, mv)] if keep_columns else None
+    for word in h_ids:
+        eq = peq.get(word, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & top:
+            score += 1
+        elif mh & top:
+            score -= 1
+        # The first row of the table grows by one per hypothesis word
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if keep_columns:
+            columns.append((pv, mv))
+    return score, columns
+
+
+def edit_distance(ref_tokens, hyp_tokens):
+    """Levenshtein distance between two token sequences (words or characters)."""
+    if not ref_tokens:
+        return len(hyp_tokens)
+    r_ids, h_ids = _to_ids(ref_tokens, hyp_tokens)
+    score, _ = _columns(r_ids, h_ids, keep_columns=False)
+    return score
+
+
+def _backtrace(r, h, r_ids, h_ids, columns, score):
+    """yield (op, i, j) from the end of the table back to its origin."""
+
+    def cost(i, j):
+        pv, mv = columns[j]
+        low = (1 << i) - 1
+        return j + _popcount(pv & low) - _popcount(mv & low)
+
+    def delta(j, i):
+        # D[i+1][j] - D[i][j]
+        pv, mv = columns[j]
+        bit = 1 << i
+        return 1 if pv & bit else (-1 if mv & bit else 0)
+
+    i = len(r)
+    j = len(h)
+    current = score
+    while i > 0 or j > 0:
+        if i == 0:
+            op = OP_INS
+        elif j == 0:
+            op = OP_DEL
+        elif r_ids[i - 1] == h_ids[j - 1]:
+            op = OP_OK
+        else:
+            left = cost(i, j - 1)
+            diagonal = left - delta(j - 1, i - 1)
+            if current == diagonal + 1:
+                op = OP_SUB
+                current = diagonal
+            elif current == left + 1:
+                op = OP_INS
+                current = left
+            else:
+                op = OP_DEL
+                current -= delta(j, i - 1)
+
+        if op == OP_OK or op == OP_SUB:
+            i -= 1
+            j -= 1
+        elif op == OP_INS:
+            j -= 1
+        else:
+            i -= 1
+        yield op, i, j
+
+
+def align(ref, hyp):
+    """word alignment of hyp against ref as a list of (op, ref word, hyp word)."""
+    r = ref.split()
+    h = hyp.split()
+    r_ids, h_ids = _to_ids(r, h)
+    score, columns = _columns(r_ids, h_ids) if r else (len(h), None)
+    lines = []
+    for op, i, j in _backtrace(r, h, r_ids, h_ids, columns, score):
+        if op == OP_OK:
+            lines.append(("OK", r[i], h[j]))
+        elif op == OP_SUB:
+            lines.append(("SUB", r[i], h[j]))
+        elif op == OP_INS:
+            lines.append(("INS", "****", h[j]))
+        else:
+            lines.append(("DEL", r[i], "****"))
+    lines.reverse()
+    return lines
+
+
+# Code adapted from https://web.archive.org/web/20171215025927/http://progfruits.blogspot.com/2014/02/word-error-rate-wer-and-word.html
+def wer(ref, hyp, debug=False):
+    r = ref.split()
+    h = hyp.split()
+    r_ids, h_ids = _to_ids(r, h)
+    score, columns = _columns(r_ids, h_ids) if r else (len(h), None)
+
+    numSub = 0
+    numDel = 0
+    numIns = 0
+    numCor = 0
+    if debug:
+        print("OP\tREF\tHYP")
+        lines = []
+    for op, i, j in _backtrace(r, h, r_ids, h_ids, columns, score):
+        if op == OP_OK:
+            numCor += 1
+            if debug:
+                lines.append("OK\t" + r[i] + "\t" + h[j])
+        elif op == OP_SUB:
+            numSub += 1
+            if debug:
+                lines.append("SUB\t" + r[i] + "\t" + h[j])
+        elif op == OP_INS:
+            numIns += 1
+            if debug:
+                lines.append("INS\t" + "****" + "\t" + h[j])
+        else:
+            numDel += 1
+            if debug:
+                lines.append("DEL\t" + r[i] + "\t" + "****")
+    if debug:
+        lines = reversed(lines)
+        for line in lines:
+            print(line)
+        print("#cor " + str(numCor))
+        print("#sub " + str(numSub))
+        print("#del " + str(numDel))
+        print("#ins " + str(numIns))
+    wer_result = round((numSub + numDel + numIns) / (float)(len(r)), 3)
+    return {'WER': wer_result, 'numCor': numCor, 'numSub': numSub, 'numIns': numIns, 'numDel': numDel,
+            "numCount": len(r)}
+
+
+class _Totals:
+    """running sums for one group of utterances."""
+
+    def __init__(self):
+        self.utterances = 0
+        self.numCor = 0
+        self.numSub = 0
+        self.numIns = 0
+        self.numDel = 0
+        self.words = 0
+        self.chars = 0
+        self.charErrors = 0
+        # sums of squares and cross products for the confidence intervals
+        self._word_moments = [0, 0, 0]
+        self._char_moments = [0, 0, 0]
+
+    def add(self, result, chars, char_errors):
+        errors = result["numSub"] + result["numIns"] + result["numDel"]
+        self.utterances += 1
+        self.numCor += result["numCor"]
+        self.numSub += result["numSub"]
+        self.numIns += result["numIns"]
+        self.numDel += result["numDel"]
+        self.words += result["numCount"]
+        self.chars += chars
+        self.charErrors += char_errors
+        for moments, e, n in ((self._word_moments, errors, result["numCount"]),
+                              (self._char_moments, char_errors, chars)):
+            moments[0] += e * e
+            moments[1] += n * n
+            moments[2] += e * n
+
+    def merge(self, other):
+        for name in ("utterances", "numCor", "numSub", "numIns", "numDel", "words", "chars", "charErrors"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for mine, theirs in ((self._word_moments, other._word_moments),
+                             (self._char_moments, other._char_moments)):
+            for k in range(3):
+                mine[k] += theirs[k]
+
+    def _interval(self, errors, count, moments, z):
+        """confidence interval of the ratio estimator errors / count over utterances."""
+        k = self.utterances
+        if count == 0:
+            return None, None, None
+        rate = errors / float(count)
+        if k < 2:
+            return rate, None, None
+        mean_e = errors / float(k)
+        mean_n = count / float(k)
+        var_e = (moments[0] - k * mean_e * mean_e) / (k - 1)
+        var_n = (moments[1] - k * mean_n * mean_n) / (k - 1)
+        cov = (moments[2] - k * mean_e * mean_n) / (k - 1)
+        variance = max(0.0, (var_e - 2 * rate * cov + rate * rate * var_n) / (k * mean_n * mean_n))
+        margin = z * math.sqrt(variance)
+        return rate, max(0.0, rate - margin), rate + margin
+
+    def summary(self, z=1.96):
+        errors = self.numSub + self.numIns + self.numDel
+        word_rate, word_low, word_high = self._interval(errors, self.words, self._word_moments, z)
+        char_rate, char_low, char_high = self._interval(self.charErrors, self.chars, self._char_moments, z)
+
+        def rounded(value):
+            return None if value is None else round(value, 3)
+
+        return {"utterances": self.utterances,
+                "WER": rounded(word_rate), "WER_CI": [rounded(word_low), rounded(word_high)],
+                "CER": rounded(char_rate), "CER_CI": [rounded(char_low), rounded(char_high)],
+                "numCor": self.numCor, "numSub": self.numSub, "numIns": self.numIns, "numDel": self.numDel,
+                "numCount": self.words, "charCount": self.chars, "charErrors": self.charErrors}
+
+
+class WerAccumulator:
+    """streaming corpus WER/CER, overall and broken down by language and engine."""
+
+    def __init__(self, z=1.96):
+        # z = 1.96 gives 95% confidence intervals
+        self.z = z
+        self.corpus = _Totals()
+        self.by_language = {}
+        self.by_engine = {}
+        self.by_engine_language = {}
+
+    def add(self, ref, hyp, language=None, engine=None, debug=False):
+        """score one utterance, returns its wer() result."""
+        hyp = hyp or ""
+        with tracer.stage("score"):
+            if ref.split():
+                result = wer(ref, hyp, debug)
+            else:
+                result = {'WER': None, 'numCor': 0, 'numSub': 0, 'numIns': len(hyp.split()), 'numDel': 0,
+                          "numCount": 0}
+            ref_chars = " ".join(ref.split())
+            char_errors = edit_distance(ref_chars, " ".join(hyp.split()))
+
+        groups = [self.corpus]
+        if language is not None:
+            groups.append(self.by_language.setdefault(language, _Totals()))
+        if engine is not None:
+            groups.append(self.by_engine.setdefault(engine, _Totals()))
+        if language is not None and engine is not None:
+            groups.append(self.by_engine_language.setdefault((engine, language), _Totals()))
+        for totals in groups:
+            totals.add(result, len(ref_chars), char_errors)
+        return result
+
+    def merge(self, other):
+        self.corpus.merge(other.corpus)
+        for mine, theirs in ((self.by_language, other.by_language),
+                             (self.by_engine, other.by_engine),
+                             (self.by_engine_language, other.by_engine_language)):
+            for key, totals in theirs.items():
+                mine.setdefault(key, _Totals()).merge(totals)
+
+    def summary(self):
+        return {"corpus": self.corpus.summary(self.z),
+                "by_language": {key: totals.summary(self.z) for key, totals in sorted(self.by_language.items())},
+                "by_engine": {key: totals.summary(self.z) for key, totals in sorted(self.by_engine.items())},
+                "by_engine_language": {"%s/%s" % key: totals.summary(self.z)
+                                       for key, totals in sorted(self.by_engine_language.items())}}
+
+    def report(self):
+        summary = self.summary()
+        rows = [("corpus", summary["corpus"])]
+        for section, label in (("by_engine", "engine"), ("by_language", "language"),
+                               ("by_engine_language", "engine/language")):
+            rows.extend(("%s=%s" % (label, key), item) for key, item in sorted(summary[section].items()))
+        print("GROUP\tUTTS\tWER\t95% CI\t\tCER\t95% CI")
+        for name, item in rows:
+            print("%s\t%d\t%s\t%s\t%s\t%s" % (name, item["utterances"], item["WER"], item["WER_CI"],
+                                               item["CER"], item["CER_CI"]))
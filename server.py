@@ -0,0 +1,506 @@
+"""
+Transcription Server
+--------------------
+
+Local asyncio service that lets many clients (e.g. airport kiosks) share the
+warm models of one box.
+
+Endpoints (HTTP/1.1, one request per connection):
+
+- POST /transcribe?engine=vosk&language=english
+      body: an audio file; WAV of any rate, channel count and 8-32 bit
+      PCM, or any format soundfile reads (see ingestion.py)
+- POST /stream?engine=vosk&language=english&rate=16000&channels=1
+      body: raw 16-bit little-endian interleaved PCM, usually sent with
+      Transfer-Encoding: chunked while the speaker is talking; it is
+      downmixed and resampled to the recognizer's rate as it arrives
+- GET /health
+      admission and model registry statistics
+
+Add mode=domain to either POST endpoint to decode against the domain phrase
+grammar (see grammar.py) instead of the open vocabulary. Vosk decodes both
+modes with the same loaded model; DeepSpeech hot-words are set on the model
+itself, so domain mode loads a second DeepSpeech model (and scorer) per
+language. --phrases LANGUAGE:FILE sets a language's domain
+phrases from a phrase file, instead of its evaluation references.
+
+Both POST endpoints answer with JSON lines, streamed as they are produced:
+
+    {"type": "partial", "text": "where is the"}
+    {"type": "final", "text": "where is the check in desk"}
+
+Recognition runs in a bounded thread pool, and recognizers (and through the
+model registry, their models) are shared between requests, so no request
+pays for a model load once the server is warm. Admission control keeps tail
+latency predictable:
+
+- at most --workers sessions are recognized at once
+- at most --max-queue more wait for a worker, for at most --queue-timeout
+  seconds; everything beyond that gets 503 with Retry-After straight away
+- a session buffers at most --buffer-blocks blocks of audio; when the
+  recognizer falls behind the server stops reading the connection, and TCP
+  flow control slows the client down
+- /transcribe reads and decodes the whole upload (at most --max-upload-mb)
+  before it waits for a worker, so slow uploads do not hold one
+
+Usage:
+
+    python server.py --port 8765 --workers 4 --prewarm vosk:english
+    python server.py --unix /tmp/asr.sock
+    python server.py --phrases english:kiosk_phrases.txt
+    curl -T checkin.wav "http://127.0.0.1:8765/transcribe?language=english"
+
+------------------------
+
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import ingestion
+from grammar import load_phrases
+from language_models import idle_timeout_from_env
+from model_registry import registry
+from recognizer import VoskRecognizer, create_recognizer
+from tracing import tracer
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+# samples per block handed to the recognizer for uploaded files
+UPLOAD_BLOCK = 4000
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class AdmissionControl:
+    """lets `workers` sessions run and `max_queue` wait, rejects the rest."""
+
+    def __init__(self, workers, max_queue, queue_timeout):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(workers)
+        self.active = 0
+        self.waiting = 0
+        self.served = 0
+        self.rejected = 0
+        self._service_time = 0.0
+
+    def _reject(self, message):
+        self.rejected += 1
+        tracer.count("rejected")
+        raise HttpError(503, message, {"Retry-After": str(self.retry_after())})
+
+    def retry_after(self):
+        """seconds until a slot is likely free, from the mean session time."""
+        mean = self._service_time / self.served if self.served else 1.0
+        return max(1, int(math.ceil(mean * (self.waiting + 1) / self.workers)))
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """hold a worker slot for one session, waiting in the queue if needed."""
+        # counted before the first await, so a burst of sessions arriving
+        # together sees every earlier one of them
+        if self.active + self.waiting >= self.workers + self.max_queue:
+            self._reject("server busy, queue is full")
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("server busy, timed out in queue")
+        finally:
+            self.waiting -= 1
+        tracer.observe("queue_wait", time.perf_counter() - start)
+        self.active += 1
+        # per session: sessions overlap, so the start time cannot live on self
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.served += 1
+            self._service_time += time.perf_counter() - started
+            self._slots.release()
+
+    def stats(self):
+        return {"workers": self.workers, "max_queue": self.max_queue, "active": self.active,
+                "waiting": self.waiting, "served": self.served, "rejected": self.rejected}
+
+
+class Response:
+    """HTTP response written as chunked JSON lines, the head is sent with the first line."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.started = False
+
+    async def _head(self, status, content_type, headers=None, chunked=False, length=None):
+        lines = ["HTTP/1.1 %d %s" % (status, REASONS.get(status, "")),
+                 "Content-Type: %s" % content_type,
+                 "Connection: close"]
+        if chunked:
+            lines.append("Transfer-Encoding: chunked")
+        else:
+            lines.append("Content-Length: %d" % length)
+        lines.extend("%s: %s" % item for item in (headers or {}).items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        self.started = True
+
+    async def line(self, record):
+        if not self.started:
+            await self._head(200, "application/x-ndjson", chunked=True)
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self.writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await self.writer.drain()
+
+    async def finish(self):
+        if not self.started:
+            await self._head(200, "application/x-ndjson", chunked=True)
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+    async def json(self, status, record, headers=None):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        await self._head(status, "application/json", headers, length=len(data))
+        self.writer.write(data)
+        await self.writer.drain()
+
+
+async def read_request(reader):
+    """parse the request line and headers, returns (method, path, query, headers)."""
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("client closed the connection")
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return method, url.path, query, headers
+
+
+async def body_chunks(reader, writer, headers, limit=None):
+    """yield the request body as it arrives, plain or chunked."""
+    if headers.get("expect", "").lower() == "100-continue":
+        writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        await writer.drain()
+    total = 0
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            line = await reader.readline()
+            try:
+                size = int(line.split(b";")[0].strip() or b"0", 16)
+            except ValueError:
+                raise HttpError(400, "bad chunk size")
+            if size < 0:
+                raise HttpError(400, "bad chunk size")
+            if size == 0:
+                # skip any trailers
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            data = await reader.readexactly(size)
+            await reader.readexactly(2)
+            total += size
+            if limit and total > limit:
+                raise HttpError(413, "body larger than %d bytes" % limit)
+            yield data
+    else:
+        try:
+            remaining = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HttpError(400, "bad Content-Length")
+        if remaining < 0:
+            raise HttpError(400, "bad Content-Length")
+        if limit and remaining > limit:
+            raise HttpError(413, "body larger than %d bytes" % limit)
+        while remaining:
+            data = await reader.read(min(remaining, 1 << 16))
+            if not data:
+                raise ConnectionError("client closed the connection")
+            remaining -= len(data)
+            yield data
+
+
+async def pcm_blocks(chunks, channels=1):
+    """mono int16 blocks from raw little-endian interleaved PCM, carrying partial frames over."""
+    frame_bytes = 2 * channels
+    carry = b""
+    async for data in chunks:
+        data = carry + data
+        usable = len(data) - len(data) % frame_bytes
+        carry = data[usable:]
+        if usable:
+            block = np.frombuffer(data[:usable], dtype="<i2").astype(np.int16, copy=False)
+            yield ingestion.downmix_block(block.reshape(-1, channels))
+
+
+async def resampled(blocks, in_rate, out_rate):
+    """mono int16 blocks converted from in_rate to out_rate as they arrive."""
+    resampler = ingestion.make_resampler(in_rate, out_rate) if in_rate != out_rate else None
+    async for block in blocks:
+        if resampler is not None:
+            block = resampler.resample_chunk(block)
+        if len(block):
+            yield block
+    if resampler is not None:
+        block = resampler.resample_chunk(np.zeros(0, dtype=np.int16), last=True)
+        if len(block):
+            yield block
+
+
+def decode_audio(data, sample_rate):
+    """mono int16 samples at sample_rate of an in-memory audio file."""
+    try:
+        return ingestion.read(io.BytesIO(data), sample_rate)
+    except ImportError:
+        # not a PCM WAV file, and soundfile is not installed to read anything else
+        raise HttpError(415, "expected a PCM WAV file")
+    except (RuntimeError, ValueError, EOFError, wave.Error) as e:
+        raise HttpError(415, "unreadable audio: %s" % e)
+
+
+async def read_audio(chunks, sample_rate):
+    """the whole uploaded audio file as mono int16 samples at sample_rate."""
+    data = b"".join([chunk async for chunk in chunks])
+    loop = asyncio.get_running_loop()
+    # decoded off the event loop, but not on a recognizer thread
+    return await loop.run_in_executor(None, decode_audio, data, sample_rate)
+
+
+def _positive_int(query, name, default):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise HttpError(400, "%s must be a positive integer" % name)
+    return value
+
+
+async def sample_blocks(samples):
+    for start in range(0, len(samples), UPLOAD_BLOCK):
+        yield samples[start:start + UPLOAD_BLOCK]
+
+
+class TranscriptionServer:
+    def __init__(self, workers=4, max_queue=16, queue_timeout=10.0, buffer_blocks=32,
+                 max_upload_mb=20, engine="vosk", language="english", phrases=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.buffer_blocks = buffer_blocks
+        self.max_upload = int(max_upload_mb * 2 ** 20)
+        self.engine = engine
+        self.language = language
+        # language -> domain phrases, for the languages not using the default ones
+        self.phrases = phrases or {}
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="recognizer")
+        self.admission = None
+        self._recognizers = {}
+        self._lock = threading.Lock()
+
+    def recognizer(self, engine, language, domain=False):
+        """shared recognizer per (engine, language, mode); models stay warm in the registry."""
+        key = (engine, language, domain)
+        with self._lock:
+            if key not in self._recognizers:
+                try:
+                    self._recognizers[key] = create_recognizer(engine, language, domain=domain,
+                                                               phrases=self.phrases.get(language))
+                except KeyError as e:
+                    raise HttpError(400, e.args[0])
+            return self._recognizers[key]
+
+    def prewarm(self, pairs):
+        for engine, language in pairs:
+            self.recognizer(engine, language).load()
+
+    def stats(self):
+        return {"admission": self.admission.stats(), "registry": registry.stats()}
+
+    async def handle(self, reader, writer):
+        response = Response(writer)
+        try:
+            method, path, query, headers = await read_request(reader)
+            if path == "/health":
+                await response.json(200, self.stats())
+            elif path in ("/transcribe", "/stream"):
+                if method != "POST":
+                    raise HttpError(405, "use POST")
+                mode = query.get("mode", "open")
+                if mode not in ("open", "domain"):
+                    raise HttpError(400, "mode must be open or domain")
+                recognizer = self.recognizer(query.get("engine", self.engine), query.get("language", self.language),
+                                             mode == "domain")
+                if path == "/transcribe":
+                    # the upload is read before a worker slot is taken, so a
+                    # slow uploader does not hold one
+                    samples = await read_audio(body_chunks(reader, writer, headers, self.max_upload),
+                                               recognizer.sample_rate)
+                    blocks = sample_blocks(samples)
+                else:
+                    rate = _positive_int(query, "rate", recognizer.sample_rate)
+                    channels = _positive_int(query, "channels", 1)
+                    blocks = resampled(pcm_blocks(body_chunks(reader, writer, headers), channels),
+                                       rate, recognizer.sample_rate)
+                await self.session(response, recognizer, blocks)
+            else:
+                raise HttpError(404, "no such endpoint: %s" % path)
+        except HttpError as e:
+            if not response.started:
+                await response.json(e.status, {"error": e.message}, e.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def session(self, response, recognizer, blocks):
+        """feed blocks to recognizer.transcribe_stream on a worker, streaming results back."""
+        async with self.admission.slot():
+            loop = asyncio.get_running_loop()
+            audio = asyncio.Queue(self.buffer_blocks)
+            results = asyncio.Queue()
+
+            def audio_blocks():
+                # runs on the worker thread, a None block ends the stream
+                while True:
+                    block = asyncio.run_coroutine_threadsafe(audio.get(), loop).result()
+                    if block is None:
+                        return
+                    yield block
+
+            def work():
+                with tracer.stage("server_session"):
+                    for kind, text in recognizer.transcribe_stream(audio_blocks()):
+                        loop.call_soon_threadsafe(results.put_nowait, (kind, text))
+
+            failures = []
+
+            async def feed():
+                try:
+                    async for block in blocks:
+                        # waits while the recognizer is behind, which stops us
+                        # reading the socket and so pushes back on the client
+                        await audio.put(block)
+                except Exception as e:
+                    # recorded before the end of stream, so no result that
+                    # follows a failed upload is ever sent
+                    failures.append(e)
+                finally:
+                    while audio.full():
+                        audio.get_nowait()
+                    audio.put_nowait(None)
+
+            future = loop.run_in_executor(self.executor, work)
+            future.add_done_callback(lambda _: results.put_nowait(None))
+            feeder = asyncio.ensure_future(feed())
+            try:
+                while True:
+                    result = await results.get()
+                    if result is None or failures:
+                        break
+                    await response.line({"type": result[0], "text": result[1]})
+                error = failures[0] if failures else None
+                if error is None:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        tracer.count("errors")
+                        error = HttpError(500, repr(e))
+                if isinstance(error, (ConnectionError, asyncio.IncompleteReadError)):
+                    raise error
+                if error is not None:
+                    if not isinstance(error, HttpError):
+                        error = HttpError(500, repr(error))
+                    if not response.started:
+                        raise error
+                    await response.line({"type": "error", "text": error.message})
+                await response.finish()
+            finally:
+                feeder.cancel()
+                await asyncio.gather(feeder, future, return_exceptions=True)
+
+    async def serve(self, host="127.0.0.1", port=8765, unix=None):
+        self.admission = AdmissionControl(self.workers, self.max_queue, self.queue_timeout)
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        where = unix or "http://%s:%d" % (host, port)
+        print("Serving on %s with %d worker(s), queue of %d" % (where, self.workers, self.max_queue))
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve speech recognition over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=4, help="sessions recognized at once")
+    parser.add_argument("--max-queue", type=int, default=16, help="sessions allowed to wait for a worker")
+    parser.add_argument("--queue-timeout", type=float, default=10.0, help="seconds a session may wait")
+    parser.add_argument("--buffer-blocks", type=int, default=32, help="audio blocks buffered per session")
+    parser.add_argument("--max-upload-mb", type=float, default=20)
+    parser.add_argument("--engine", default="vosk", help="default engine")
+    parser.add_argument("--language", default="english", help="default language")
+    parser.add_argument("--prewarm", action="append", default=[], metavar="ENGINE:LANGUAGE",
+                        help="load a model before accepting requests (repeatable)")
+    parser.add_argument("--phrases", action="append", default=[], metavar="LANGUAGE:FILE",
+                        help="domain phrases of a language, one per line (repeatable)")
+    args = parser.parse_args(argv)
+
+    phrases = {}
+    for item in args.phrases:
+        language, _, path = item.partition(":")
+        if not path:
+            parser.error("--phrases expects LANGUAGE:FILE, got %r" % item)
+        phrases[language] = load_phrases(path)
+    server = TranscriptionServer(args.workers, args.max_queue, args.queue_timeout, args.buffer_blocks,
+                                 args.max_upload_mb, args.engine, args.language, phrases)
+    try:
+        # VOSK_IDLE_TIMEOUT unloads a model after that many seconds without use
+        VoskRecognizer.language_models.set_idle_timeout(idle_timeout_from_env("VOSK_IDLE_TIMEOUT"))
+    except ValueError as e:
+        parser.error(e.args[0])
+    server.prewarm(item.split(":", 1) for item in args.prewarm)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("Server stopped:", json.dumps(server.admission.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Startup Report
+--------------
+
+Measures what importing each entry point costs, from the `-X importtime`
+output of a fresh interpreter, grouped by top-level package.
+
+Engine, DSP and audio device dependencies (DEFERRED) must only be imported
+by the stages that use them, so that batch and scoring runs start quickly
+and work on machines without an audio device. Any of them imported eagerly
+is flagged, and the exit status is 1, so the report doubles as a check.
+
+Usage:
+
+    python startup_report.py                        # every entry point
+    python startup_report.py scoring batch_transcribe --top 15
+    python startup_report.py --budget 1.0 --json startup.json
+
+------------------------
+
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ["scoring", "batch_transcribe", "merge_results", "benchmark", "server", "assistant_menu",
+                "deepspeech_file", "vosk_file", "deepspeech_mic"]
+
+# imported lazily by the stages that need them
+DEFERRED = ["deepspeech", "vosk", "noisereduce", "librosa", "numba", "scipy", "sounddevice",
+            "soundfile", "soxr", "webrtcvad", "pyarrow"]
+
+
+def import_times(module):
+    """import module in a fresh interpreter, returns (wall seconds, {module: self microseconds})."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                             capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - start
+    times = {}
+    errors = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the column header
+        times[fields[2].strip()] = int(fields[0])
+    if process.returncode:
+        raise ImportError(errors[-1] if errors else "import %s failed" % module)
+    return wall, times
+
+
+def measure(module):
+    wall, times = import_times(module)
+    packages = {}
+    for name, self_us in times.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return {"module": module,
+            "wall_seconds": round(wall, 3),
+            "import_seconds": round(sum(packages.values()) / 1e6, 3),
+            "packages": {package: round(us / 1e3, 1) for package, us in
+                         sorted(packages.items(), key=lambda item: -item[1])},
+            "eager": sorted(package for package in packages if package in DEFERRED)}
+
+
+def print_report(result, top=10):
+    print("%s: %.3fs to start, %.3fs importing" % (result["module"], result["wall_seconds"],
+                                                   result["import_seconds"]))
+    for package, ms in list(result["packages"].items())[:top]:
+        print("  %-24s %8.1f ms" % (package, ms))
+    if result["eager"]:
+        print("  imported eagerly:", ", ".join(result["eager"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import cost of each entry point")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("--top", type=int, default=10, help="packages listed per module")
+    parser.add_argument("--budget", type=float, default=None, help="fail if an import takes longer (seconds)")
+    parser.add_argument("--json", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    failed = False
+    for module in args.modules:
+        try:
+            result = measure(module)
+        except ImportError as e:
+            print("%s: import failed: %s" % (module, e.args[0]))
+            results.append({"module": module, "error": e.args[0]})
+            failed = True
+            continue
+        print_report(result, args.top)
+        if result["eager"] or (args.budget is not None and result["import_seconds"] > args.budget):
+            failed = True
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules live at the top of the repository, next to the scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# keep test runs out of the shared result cache
+os.environ.setdefault("RESULT_CACHE", "0")
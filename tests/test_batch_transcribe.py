@@ -0,0 +1,97 @@
+import gc
+
+import batch_transcribe
+import model_registry
+from checkpoint import read_results
+from corpus import ManifestItem, evaluation_manifest
+from recognizer import StubRecognizer
+
+
+def stub_hypothesis(reference, drop_every=5):
+    return " ".join(word for i, word in enumerate(reference.split(), 1) if i % drop_every)
+
+
+def test_results_come_back_in_manifest_order():
+    manifest = evaluation_manifest("stub")
+    results = list(batch_transcribe.transcribe_batch(manifest, processes=2, chunksize=1, use_cache=False))
+    assert [result.index for result in results] == list(range(len(manifest)))
+    for result, item in zip(results, manifest):
+        assert result.item == item
+        assert result.error is None
+        assert result.hypothesis == stub_hypothesis(item.reference)
+
+
+def test_unknown_engine_fails_its_items_only():
+    manifest = evaluation_manifest("stub", ["english"])[:2] + [
+        ManifestItem("a b", "english/a.wav", "english", "bogus")]
+    results = list(batch_transcribe.transcribe_batch(manifest, processes=2, use_cache=False))
+    assert [result.error is None for result in results] == [True, True, False]
+    assert "Unknown engine" in results[2].error
+
+
+def test_configured_recognizers_are_used_by_the_workers():
+    manifest = evaluation_manifest("stub", ["english"])
+    results = batch_transcribe.transcribe_batch(manifest, processes=2, use_cache=False,
+                                                recognizers=[StubRecognizer("english", drop_every=2)])
+    for result in results:
+        assert result.hypothesis == stub_hypothesis(result.item.reference, drop_every=2)
+
+
+def test_output_checkpoint_resumes(tmp_path, capsys):
+    output = str(tmp_path / "results.jsonl")
+    batch_transcribe.main(["--engine", "stub", "--language", "english", "--processes", "2", "--output", output])
+    first = read_results(output)
+    assert len(first) == len(evaluation_manifest("stub", ["english"]))
+    capsys.readouterr()
+
+    batch_transcribe.main(["--engine", "stub", "--language", "english", "--output", output])
+    assert "Skipping %d item(s)" % len(first) in capsys.readouterr().err
+    assert read_results(output) == first
+
+    # another decoding mode is not skipped
+    batch_transcribe.main(["--engine", "stub", "--language", "english", "--domain", "--output", output])
+    modes = [record["mode"] for record in read_results(output)]
+    assert modes.count("open") == len(first)
+    assert modes.count("domain") == len(first)
+
+
+def test_workers_are_spawned_when_a_model_does_not_survive_fork(monkeypatch):
+    context, frozen = batch_transcribe._pool_context(True, [("deepspeech", "english")])
+    assert context.get_start_method() == "spawn" and not frozen
+
+    # a DeepSpeech model the parent already holds counts too
+    monkeypatch.setitem(model_registry.LOADERS, "deepspeech", lambda model, scorer=None, **settings: object())
+    model_registry.registry.get("deepspeech", "fake.pbmm")
+    try:
+        context, frozen = batch_transcribe._pool_context(True, [("stub", "english")])
+        assert context.get_start_method() == "spawn" and not frozen
+        manifest = evaluation_manifest("stub", ["english"])
+        results = list(batch_transcribe.transcribe_batch(manifest, processes=2, use_cache=False))
+        assert [result.hypothesis for result in results] == [stub_hypothesis(item.reference) for item in manifest]
+    finally:
+        model_registry.registry.unload("deepspeech", "fake.pbmm")
+
+
+def test_fork_safe_models_are_shared():
+    context, frozen = batch_transcribe._pool_context(True, [("stub", "english")])
+    gc.unfreeze()
+    assert context.get_start_method() == "fork" and frozen
+
+
+def test_phrase_file_runs_are_a_mode_of_their_own(tmp_path):
+    output = str(tmp_path / "results.jsonl")
+    phrases = tmp_path / "phrases.txt"
+    phrases.write_text("where is the check in desk\n", encoding="utf-8")
+    for _ in range(2):
+        batch_transcribe.main(["--engine", "stub", "--language", "english", "--phrases", str(phrases),
+                               "--output", output])
+    modes = [record["mode"] for record in read_results(output)]
+    # the second run resumes the first, so each item is there once
+    assert modes == ["domain:" + str(phrases)] * len(evaluation_manifest("stub", ["english"]))
+
+
+def test_details_are_collected():
+    manifest = evaluation_manifest("stub", ["spanish"])
+    for result in batch_transcribe.transcribe_batch(manifest, processes=1, alternatives=1):
+        assert result.details.text == result.hypothesis
+        assert len(result.details.words) == len(result.hypothesis.split())
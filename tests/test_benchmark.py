@@ -0,0 +1,52 @@
+import json
+
+import benchmark
+from corpus import ManifestItem, evaluation_manifest
+
+
+def test_run_engine_reports_every_language():
+    manifest = evaluation_manifest("stub")
+    rows = benchmark.run_engine("stub", manifest, repeats=2)
+    assert [row["language"] for row in rows] == ["english", "italian", "spanish"]
+    for row in rows:
+        files = sum(1 for item in manifest if item.language == row["language"])
+        assert row["files"] == files
+        assert row["failures"] == 0
+        assert row["mode"] == "open"
+        # the stub drops every fifth word
+        assert 0 < row["WER"] < 1
+        assert row["latency_p50"] is not None
+
+
+def test_failures_are_counted_and_scored_as_empty(monkeypatch):
+    manifest = [ManifestItem("a b c", "english/ok.wav", "english", "stub"),
+                ManifestItem("d e f", "english/broken.wav", "english", "stub")]
+    transcribe_file = benchmark.StubRecognizer.transcribe_file
+
+    def failing(self, audio_file):
+        if audio_file == "english/broken.wav":
+            raise RuntimeError("unreadable")
+        return transcribe_file(self, audio_file)
+
+    monkeypatch.setattr(benchmark.StubRecognizer, "transcribe_file", failing)
+    row, = benchmark.run_engine("stub", manifest)
+    assert row["failures"] == 1
+    assert row["WER"] == 0.5
+
+
+def test_run_isolated_matches_run_engine():
+    manifest = evaluation_manifest("stub", ["english"])
+    row, = benchmark.run_isolated("stub", manifest, timeout=60)
+    assert row["WER"] == benchmark.run_engine("stub", manifest)[0]["WER"]
+
+
+def test_main_writes_json_and_csv(tmp_path):
+    report_path = tmp_path / "bench.json"
+    csv_path = tmp_path / "bench.csv"
+    benchmark.main(["--engine", "stub", "--language", "english", "--no-isolate",
+                    "--json", str(report_path), "--csv", str(csv_path)])
+    with open(report_path, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["meta"]["manifest_items"] == len(evaluation_manifest("stub", ["english"]))
+    assert [row["mode"] for row in report["results"]] == ["open"]
+    assert csv_path.read_text(encoding="utf-8").splitlines()[0].startswith("engine,language,mode")
@@ -0,0 +1,82 @@
+import json
+
+from checkpoint import finished, open_results, read_results, write_record
+from corpus import ManifestItem, item_key, shard, write_manifest
+import merge_results
+
+ITEMS = [ManifestItem("a b c", "english/a.wav", "english", "stub"),
+         ManifestItem("d e", "english/d.wav", "english", "stub"),
+         ManifestItem("f", "english/f.wav", "english", "stub")]
+
+
+def record(item, hypothesis, error=None, mode=None):
+    result = dict(item._asdict(), hypothesis=hypothesis, error=error)
+    if mode is not None:
+        result["mode"] = mode
+    return result
+
+
+def write_results(path, records):
+    with open_results(str(path)) as out:
+        for result in records:
+            write_record(out, result)
+
+
+def test_open_results_drops_partial_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_results(path, [record(ITEMS[0], "a b c")])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"reference": "d e", "audio')
+    write_results(path, [record(ITEMS[1], "d e")])
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["audio_file"] for line in lines] == ["english/a.wav", "english/d.wav"]
+
+
+def test_finished_skips_failures_and_other_modes(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_results(path, [record(ITEMS[0], "a b c"),
+                         record(ITEMS[1], "", error="RuntimeError()"),
+                         record(ITEMS[2], "f", mode="domain")])
+    assert set(finished(str(path))) == {item_key(ITEMS[0])}
+    assert set(finished(str(path), "domain")) == {item_key(ITEMS[2])}
+    assert finished(str(tmp_path / "missing.jsonl")) == {}
+
+
+def test_read_results_skips_a_cut_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps(record(ITEMS[0], "a b c")) + '\n{"refer', encoding="utf-8")
+    assert len(read_results(str(path))) == 1
+
+
+def test_merge_prefers_successful_and_later_records(tmp_path):
+    first = tmp_path / "results.0.jsonl"
+    second = tmp_path / "results.1.jsonl"
+    write_results(first, [record(ITEMS[0], "a b"), record(ITEMS[1], "d e")])
+    write_results(second, [record(ITEMS[0], "a b c"), record(ITEMS[1], "", error="RuntimeError()")])
+    merged, duplicates = merge_results.merge([str(first), str(second)])
+    assert duplicates == 2
+    assert merged[("open", item_key(ITEMS[0]))]["hypothesis"] == "a b c"
+    assert merged[("open", item_key(ITEMS[1]))]["error"] is None
+
+
+def test_merge_reports_missing_items(tmp_path, capsys):
+    manifest = tmp_path / "corpus.csv"
+    write_manifest(ITEMS, str(manifest))
+    results = tmp_path / "results.jsonl"
+    write_results(results, [record(ITEMS[0], "a b c"), record(ITEMS[1], "d e")])
+    output = tmp_path / "merged.jsonl"
+    report = tmp_path / "report.json"
+    status = merge_results.main([str(results), "--manifest", str(manifest), "--output", str(output),
+                                 "--json", str(report)])
+    assert status == 1
+    assert "missing=1" in capsys.readouterr().err
+    assert [result["audio_file"] for result in read_results(str(output))] == ["english/a.wav", "english/d.wav"]
+    with open(report, encoding="utf-8") as f:
+        assert json.load(f)["summary"]["corpus"]["WER"] == 0.0
+
+
+def test_shards_partition_the_manifest():
+    items = [ManifestItem("x", "file%d.wav" % k, "english", "stub") for k in range(50)]
+    shards = [shard(items, "%d/4" % index) for index in range(4)]
+    assert sorted(item for part in shards for item in part) == sorted(items)
+    assert shard(items, (1, 4)) == shards[1]
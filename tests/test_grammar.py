@@ -0,0 +1,22 @@
+import json
+
+from grammar import hot_words, load_phrases, vosk_grammar
+
+
+def test_vosk_grammar_normalises_phrases():
+    grammar = json.loads(vosk_grammar("english", ["Where is the Check-in desk?", "Hello", ""]))
+    assert grammar == ["hello", "where is the check in desk", "[unk]"]
+    assert json.loads(vosk_grammar("english", ["hello"], unknown=False)) == ["hello"]
+
+
+def test_hot_words_leave_out_stopwords():
+    words = dict(hot_words("english", ["where is the check in desk", "I have lost my bag"]))
+    assert sorted(words) == ["bag", "check", "desk", "lost"]
+    assert dict(hot_words("italian", ["dove è il pancone"])) == {"pancone": 10.0}
+    assert set(dict(hot_words("english", ["check in"], boost=4.0)).values()) == {4.0}
+
+
+def test_load_phrases_skips_blank_lines(tmp_path):
+    path = tmp_path / "phrases.txt"
+    path.write_text("where is the gate\n\n  baggage claim  \n", encoding="utf-8")
+    assert load_phrases(str(path)) == ["where is the gate", "baggage claim"]
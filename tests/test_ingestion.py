@@ -0,0 +1,91 @@
+import io
+import os
+import wave
+
+import numpy as np
+import pytest
+
+import ingestion
+from ingestion import _wav_to_int16, read, save_npy, stream
+
+
+def write_wav(path, frames, rate, sampwidth=2):
+    """frames is an int array of shape (n, channels) already in the sample width's range."""
+    frames = np.asarray(frames)
+    if sampwidth == 1:
+        data = (frames + 128).astype(np.uint8).tobytes()
+    elif sampwidth == 3:
+        data = frames.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    else:
+        data = frames.astype("<i%d" % sampwidth).tobytes()
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(frames.shape[1])
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(rate)
+        wf.writeframes(data)
+
+
+def test_wav_to_int16_keeps_the_most_significant_bits():
+    assert list(_wav_to_int16(bytes([0, 128, 255]), 1)) == [-32768, 0, 127 << 8]
+    samples = np.array([-(1 << 23), -1, 0, 0x123456, (1 << 23) - 1], dtype="<i4")
+    data = samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    assert list(_wav_to_int16(data, 3)) == [-32768, -1, 0, 0x1234, 32767]
+    samples = np.array([-(1 << 31), -1, 0x12345678, (1 << 31) - 1], dtype="<i4")
+    assert list(_wav_to_int16(samples.tobytes(), 4)) == [-32768, -1, 0x1234, 32767]
+    with pytest.raises(ValueError):
+        _wav_to_int16(b"\0" * 5, 5)
+
+
+@pytest.mark.parametrize("sampwidth", [1, 2, 3, 4])
+def test_any_pcm_width_reads_the_same(tmp_path, sampwidth):
+    path = str(tmp_path / "tone.wav")
+    # multiples of 256, so even 8-bit audio holds them exactly
+    int16 = (np.sin(np.arange(1000) / 10.0) * 20000).astype(np.int16) // 256 * 256
+    shift = 8 * (sampwidth - 2)
+    frames = int16.astype(np.int64) << shift if shift >= 0 else int16.astype(np.int64) >> -shift
+    write_wav(path, frames[:, None], 16000, sampwidth)
+    assert np.array_equal(read(path, 16000), int16)
+
+
+def test_channels_are_downmixed_or_selected(tmp_path):
+    path = str(tmp_path / "stereo.wav")
+    left = np.arange(0, 2000, 2)
+    write_wav(path, np.stack([left, -left], axis=1), 16000)
+    assert not read(path, 16000).any()
+    assert np.array_equal(read(path, 16000, channel=1), -left)
+    with pytest.raises(ValueError):
+        list(stream(path, 16000, channel=2))
+
+
+def test_resampling_is_streamed_block_by_block(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    write_wav(path, (np.sin(np.arange(44100) / 20.0) * 10000).astype(np.int16)[:, None], 44100)
+    blocks = list(stream(path, 16000))
+    assert len(blocks) > 1
+    assert abs(sum(len(block) for block in blocks) - 16000) <= 2
+    assert np.array_equal(read(path, 16000), np.concatenate(blocks))
+
+
+def test_in_memory_files_are_read(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    write_wav(path, np.arange(3000)[:, None], 8000)
+    with open(path, "rb") as f:
+        upload = io.BytesIO(f.read())
+    assert np.array_equal(read(upload, 16000), read(path, 16000))
+
+
+def test_save_npy_rewrites_the_header_and_truncates(tmp_path):
+    path = str(tmp_path / "tone.wav")
+    samples = (np.sin(np.arange(22050) / 7.0) * 10000).astype(np.int16)
+    write_wav(path, samples[:, None], 22050)
+    npy_path = str(tmp_path / "tone.npy")
+    count = save_npy(path, npy_path, 16000)
+    assert count < ingestion._capacity(path, 16000)
+    loaded = np.load(npy_path)
+    assert loaded.shape == (count,)
+    assert np.array_equal(loaded, read(path, 16000))
+    with open(npy_path, "rb") as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        offset = f.tell()
+    assert os.path.getsize(npy_path) == offset + 2 * count
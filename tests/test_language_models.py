@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import model_registry
+from language_models import LanguageModels, idle_timeout_from_env
+from model_registry import ModelRegistry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def models(tmp_path, monkeypatch):
+    monkeypatch.setitem(model_registry.LOADERS, "fake", lambda model, scorer=None, **settings: object())
+    paths = {}
+    for language in ("english", "spanish"):
+        path = tmp_path / language
+        path.write_bytes(b"\0")
+        paths[language] = str(path)
+    language_models = LanguageModels("fake", paths, registry=ModelRegistry())
+    yield language_models
+    language_models.close()
+
+
+def test_models_load_on_first_use(models):
+    assert not models.is_loaded("english")
+    assert models.get("english") is models.get("english")
+    assert models.is_loaded("english") and not models.is_loaded("spanish")
+    with pytest.raises(KeyError):
+        models.get("klingon")
+
+
+def test_idle_models_are_unloaded(models):
+    models.get("english")
+    models.get("spanish")
+    assert models.unload_idle(now=1e12) == []
+    models.set_idle_timeout(60)
+    assert models._reaper is not None
+    assert sorted(models.unload_idle(now=1e12)) == ["english", "spanish"]
+    assert not models.is_loaded("english")
+
+
+def test_importing_the_recognizers_starts_no_thread():
+    code = "import threading, recognizer; print(threading.active_count())"
+    env = dict(os.environ, VOSK_IDLE_TIMEOUT="not a number")
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT, env=env)
+    assert output.strip() == b"1"
+
+
+def test_idle_timeout_from_env(monkeypatch):
+    monkeypatch.delenv("IDLE", raising=False)
+    assert idle_timeout_from_env("IDLE") is None
+    monkeypatch.setenv("IDLE", "0")
+    assert idle_timeout_from_env("IDLE") is None
+    monkeypatch.setenv("IDLE", "90")
+    assert idle_timeout_from_env("IDLE") == 90.0
+    monkeypatch.setenv("IDLE", "ten")
+    with pytest.raises(ValueError):
+        idle_timeout_from_env("IDLE")
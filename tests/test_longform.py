@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from longform import plan_windows, stitch, transcribe_long
+
+RATE = 100
+
+
+def test_short_audio_is_one_window():
+    assert plan_windows(np.ones(500), RATE, window_seconds=10) == [(0, 500)]
+
+
+def test_windows_cover_the_audio_and_overlap():
+    samples = np.random.RandomState(0).randint(-1000, 1000, 10000)
+    windows = plan_windows(samples, RATE, window_seconds=10, overlap_seconds=1, search_seconds=3)
+    assert windows[0][0] == 0 and windows[-1][1] == len(samples)
+    for (start, end), (next_start, next_end) in zip(windows, windows[1:]):
+        assert end - start <= 10 * RATE
+        # neighbours overlap by exactly the overlap
+        assert end - next_start == RATE
+        assert next_start > start
+
+
+def test_windows_are_cut_in_the_quietest_frame():
+    samples = np.full(2000, 1000)
+    # the search for the first cut covers samples 650 to 950 in 30-sample frames
+    samples[860:890] = 0
+    windows = plan_windows(samples, RATE, window_seconds=10, overlap_seconds=1, search_seconds=3, frame_ms=300)
+    # the cut sits in the middle of the silent frame, half the overlap either side
+    assert windows[0] == (0, 875 + 50)
+    assert windows[1][0] == 875 - 50
+
+
+@pytest.mark.parametrize("overlap", [-1, 10, 12])
+def test_overlap_must_be_shorter_than_the_window(overlap):
+    with pytest.raises(ValueError):
+        plan_windows(np.ones(5000), RATE, window_seconds=10, overlap_seconds=overlap)
+
+
+def test_stitch_keeps_the_overlap_once():
+    assert stitch("where is the".split(), "the check in desk".split()) == "where is the check in desk".split()
+    assert stitch("a b c d".split(), "c d e".split()) == "a b c d e".split()
+
+
+def test_stitch_drops_unaligned_copies_of_the_overlap():
+    # "c" was heard as "see" at the end of the left window
+    assert stitch("a b see d".split(), "c d e".split()) == "a b see d e".split()
+
+
+def test_stitch_does_not_join_on_a_distant_common_word():
+    left = "the gate is closed now".split()
+    right = "please go to the desk".split()
+    assert stitch(left, right) == left + right
+    assert stitch([], right) == right
+
+
+def test_transcribe_long_stitches_windows_in_order():
+    words = ["w%d" % k for k in range(100)]
+    samples = np.arange(100 * RATE)
+
+    def transcribe_window(window):
+        # a word per second of audio
+        return " ".join(words[window[0] // RATE:(window[-1] // RATE) + 1])
+
+    text = transcribe_long(samples, RATE, transcribe_window, window_seconds=20, overlap_seconds=2, workers=3)
+    assert text == " ".join(words)
@@ -0,0 +1,86 @@
+import pytest
+
+import model_registry
+from model_registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+
+
+@pytest.fixture
+def model_files(tmp_path, monkeypatch):
+    """paths of three 1000-byte "models", loaded by a fake loader that counts its calls."""
+    loads = []
+
+    def load(model, scorer=None, **settings):
+        loads.append(model)
+        return FakeModel(model)
+
+    monkeypatch.setitem(model_registry.LOADERS, "fake", load)
+    paths = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / name
+        path.write_bytes(b"\0" * 1000)
+        paths.append(str(path))
+    return paths, loads
+
+
+def test_models_are_loaded_once(model_files):
+    (a, _, _), loads = model_files
+    registry = ModelRegistry()
+    first = registry.get("fake", a)
+    assert registry.get("fake", a) is first
+    assert registry.get("fake", a, beam_width=10) is not first
+    assert loads == [a, a]
+    stats = registry.stats()
+    assert (stats["hits"], stats["misses"], stats["loaded"]) == (1, 2, 2)
+
+
+def test_least_recently_used_model_is_evicted(model_files):
+    (a, b, c), loads = model_files
+    registry = ModelRegistry(memory_budget=2500)
+    registry.get("fake", a)
+    registry.get("fake", b)
+    registry.get("fake", a)
+    registry.get("fake", c)
+    assert not registry.is_loaded("fake", b)
+    assert registry.is_loaded("fake", a) and registry.is_loaded("fake", c)
+    assert registry.resident_bytes() == 2000
+    assert registry.stats()["evictions"] == 1
+
+    registry.set_memory_budget(1000)
+    assert [item["model"] for item in registry.stats()["models"]] == [c]
+
+
+def test_a_model_over_budget_on_its_own_stays_loaded(model_files):
+    (a, _, _), _ = model_files
+    registry = ModelRegistry(memory_budget=10)
+    registry.get("fake", a)
+    assert registry.is_loaded("fake", a)
+
+
+def test_unload_listeners_hear_of_every_model_that_leaves(model_files):
+    (a, b, c), _ = model_files
+    registry = ModelRegistry(memory_budget=2500)
+    unloaded = []
+    registry.add_unload_listener(lambda engine, model: unloaded.append((engine, model.path)))
+    registry.get("fake", a)
+    registry.get("fake", b)
+    registry.get("fake", c)
+    assert unloaded == [("fake", a)]
+    assert registry.unload("fake", b)
+    assert not registry.unload("fake", b)
+    registry.clear()
+    assert unloaded == [("fake", a), ("fake", b), ("fake", c)]
+
+
+def test_listeners_may_use_the_registry(model_files):
+    (a, b, _), _ = model_files
+    registry = ModelRegistry(memory_budget=1500)
+    seen = []
+    registry.add_unload_listener(lambda engine, model: seen.append(registry.stats()["loaded"]))
+    registry.get("fake", a)
+    registry.get("fake", b)
+    assert seen == [1]
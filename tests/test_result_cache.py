@@ -0,0 +1,81 @@
+import pytest
+
+from result_cache import ResultCache
+
+
+class FakeRecognizer:
+    name = "fake"
+    cacheable = True
+
+    def __init__(self, model, beam=10):
+        self.model = model
+        self.beam = beam
+        self.calls = 0
+
+    def model_files(self):
+        return [self.model]
+
+    def settings(self, audio_file, **options):
+        return {"beam": self.beam}
+
+    def transcribe_file(self, audio_file):
+        self.calls += 1
+        return "hello"
+
+
+@pytest.fixture
+def files(tmp_path):
+    model = tmp_path / "model"
+    model.mkdir()
+    (model / "graph").write_bytes(b"graph v1")
+    audio = tmp_path / "a.wav"
+    audio.write_bytes(b"audio")
+    return str(model), str(audio), tmp_path
+
+
+def test_key_changes_with_settings_audio_and_model(files):
+    model, audio, tmp_path = files
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    key = cache.key(FakeRecognizer(model), audio)
+    assert cache.key(FakeRecognizer(model), audio) == key
+    assert cache.key(FakeRecognizer(model, beam=20), audio) != key
+
+    (tmp_path / "b.wav").write_bytes(b"other audio")
+    assert cache.key(FakeRecognizer(model), str(tmp_path / "b.wav")) != key
+
+    (tmp_path / "model" / "graph").write_bytes(b"graph v2")
+    # a new process sees the new model
+    fresh = ResultCache(str(tmp_path / "cache.sqlite"))
+    assert fresh.key(FakeRecognizer(model), audio) != key
+
+
+def test_model_hashes_are_worked_out_once(files, monkeypatch):
+    model, audio, tmp_path = files
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    hashed = []
+    file_hash = cache.file_hash
+    monkeypatch.setattr(cache, "file_hash", lambda path: hashed.append(path) or file_hash(path))
+    for _ in range(3):
+        cache.key(FakeRecognizer(model), audio)
+    assert hashed.count(model) == 1
+    assert hashed.count(audio) == 3
+
+
+def test_transcribe_is_served_from_the_cache(files):
+    model, audio, tmp_path = files
+    cache = ResultCache(str(tmp_path / "cache.sqlite"))
+    recognizer = FakeRecognizer(model)
+    assert cache.transcribe(recognizer, audio) == "hello"
+    assert cache.transcribe(recognizer, audio) == "hello"
+    assert recognizer.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_results_are_evicted(files):
+    _, _, tmp_path = files
+    cache = ResultCache(str(tmp_path / "cache.sqlite"), max_bytes=300, check_every=1)
+    for k in range(5):
+        cache.put("key%d" % k, "x" * 50)
+    assert cache.get("key0") is None
+    assert cache.get("key4") == "x" * 50
+    assert cache.stats()["bytes"] <= 300
@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+
+def test_read_wraps_around_the_end():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    assert list(ring.read(4)) == [0, 1, 2, 3]
+    ring.write(np.arange(6, 11, dtype=np.int16))
+    assert ring.available() == 7
+    # a view never wraps, so the rest comes in two reads
+    assert list(ring.read()) == [4, 5, 6, 7]
+    assert list(ring.read()) == [8, 9, 10]
+    assert len(ring.read()) == 0
+
+
+def test_read_exactly_copies_only_across_the_end():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    first = ring.read_exactly(4)
+    assert np.shares_memory(first, ring._buffer)
+    ring.write(np.arange(6, 10, dtype=np.int16))
+    second = ring.read_exactly(5)
+    assert list(second) == [4, 5, 6, 7, 8]
+    assert not np.shares_memory(second, ring._buffer)
+
+
+def test_overrun_drops_the_oldest_samples():
+    ring = RingBuffer(8)
+    ring.write(np.arange(5, dtype=np.int16))
+    ring.write(np.arange(5, 12, dtype=np.int16))
+    samples = np.concatenate([ring.read(), ring.read()])
+    assert list(samples) == list(range(4, 12))
+    assert ring.stats()["overruns"] == 1
+    assert ring.stats()["dropped"] == 4
+
+
+def test_block_longer_than_the_buffer_keeps_its_tail():
+    ring = RingBuffer(4)
+    ring.write(np.arange(10, dtype=np.int16))
+    assert list(ring.read_exactly(4)) == [6, 7, 8, 9]
+    assert ring.dropped == 6
+
+
+def test_read_exactly_times_out_and_waits_for_the_producer():
+    ring = RingBuffer(16)
+    ring.write(np.zeros(2, dtype=np.int16))
+    assert ring.read_exactly(4, timeout=0.01) is None
+
+    timer = threading.Timer(0.05, ring.write, [np.ones(4, dtype=np.int16)])
+    timer.start()
+    try:
+        assert list(ring.read_exactly(4, timeout=5)) == [0, 0, 1, 1]
+    finally:
+        timer.join()
@@ -0,0 +1,149 @@
+import random
+
+import pytest
+
+from scoring import WerAccumulator, align, edit_distance, wer
+
+
+def reference_wer(ref, hyp, debug=False):
+    """the table-based wer() the scripts used before scoring.py, kept as the oracle."""
+    r = ref.split()
+    h = hyp.split()
+    costs = [[0] * (len(h) + 1) for _ in range(len(r) + 1)]
+    backtrace = [[0] * (len(h) + 1) for _ in range(len(r) + 1)]
+    OP_OK, OP_SUB, OP_INS, OP_DEL = 0, 1, 2, 3
+    for i in range(1, len(r) + 1):
+        costs[i][0] = i
+        backtrace[i][0] = OP_DEL
+    for j in range(1, len(h) + 1):
+        costs[0][j] = j
+        backtrace[0][j] = OP_INS
+    for i in range(1, len(r) + 1):
+        for j in range(1, len(h) + 1):
+            if r[i - 1] == h[j - 1]:
+                costs[i][j] = costs[i - 1][j - 1]
+                backtrace[i][j] = OP_OK
+            else:
+                substitution = costs[i - 1][j - 1] + 1
+                insertion = costs[i][j - 1] + 1
+                deletion = costs[i - 1][j] + 1
+                costs[i][j] = min(substitution, insertion, deletion)
+                if costs[i][j] == substitution:
+                    backtrace[i][j] = OP_SUB
+                elif costs[i][j] == insertion:
+                    backtrace[i][j] = OP_INS
+                else:
+                    backtrace[i][j] = OP_DEL
+
+    i = len(r)
+    j = len(h)
+    counts = {"numCor": 0, "numSub": 0, "numIns": 0, "numDel": 0}
+    lines = []
+    while i > 0 or j > 0:
+        op = backtrace[i][j]
+        if op == OP_OK:
+            counts["numCor"] += 1
+            i -= 1
+            j -= 1
+            lines.append("OK\t" + r[i] + "\t" + h[j])
+        elif op == OP_SUB:
+            counts["numSub"] += 1
+            i -= 1
+            j -= 1
+            lines.append("SUB\t" + r[i] + "\t" + h[j])
+        elif op == OP_INS:
+            counts["numIns"] += 1
+            j -= 1
+            lines.append("INS\t" + "****" + "\t" + h[j])
+        else:
+            counts["numDel"] += 1
+            i -= 1
+            lines.append("DEL\t" + r[i] + "\t" + "****")
+    if debug:
+        print("OP\tREF\tHYP")
+        for line in reversed(lines):
+            print(line)
+        for name in ("cor", "sub", "del", "ins"):
+            print("#%s %d" % (name, counts["num" + name.capitalize()]))
+    errors = counts["numSub"] + counts["numDel"] + counts["numIns"]
+    return dict(counts, WER=round(errors / float(len(r)), 3), numCount=len(r))
+
+
+def random_pairs(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["w%d" % k for k in range(6)]
+    for _ in range(count):
+        ref = [rng.choice(vocabulary) for _ in range(rng.randint(1, 12))]
+        # edit the reference, so the pair has realistic errors and ties
+        hyp = []
+        for word in ref:
+            roll = rng.random()
+            if roll < 0.6:
+                hyp.append(word)
+            elif roll < 0.75:
+                hyp.append(rng.choice(vocabulary))
+            elif roll < 0.9:
+                hyp.extend([word, rng.choice(vocabulary)])
+        yield " ".join(ref), " ".join(hyp)
+
+
+def test_wer_matches_table_implementation():
+    for ref, hyp in random_pairs(20000):
+        assert wer(ref, hyp) == reference_wer(ref, hyp), (ref, hyp)
+
+
+def test_wer_debug_output_matches_table_implementation(capsys):
+    for ref, hyp in random_pairs(500, seed=1):
+        wer(ref, hyp, debug=True)
+        new = capsys.readouterr().out
+        reference_wer(ref, hyp, debug=True)
+        assert new == capsys.readouterr().out, (ref, hyp)
+
+
+def test_wer_long_reference():
+    # references longer than a machine word
+    ref = " ".join("w%d" % (k % 7) for k in range(300))
+    hyp = " ".join("w%d" % (k % 5) for k in range(280))
+    assert wer(ref, hyp) == reference_wer(ref, hyp)
+
+
+def test_wer_empty_hypothesis():
+    assert wer("a b c", "") == {"WER": 1.0, "numCor": 0, "numSub": 0, "numIns": 0, "numDel": 3, "numCount": 3}
+
+
+def test_align():
+    assert align("a b c", "a x c d") == [("OK", "a", "a"), ("SUB", "b", "x"), ("OK", "c", "c"),
+                                         ("INS", "****", "d")]
+
+
+@pytest.mark.parametrize("ref, hyp, expected", [
+    ("", "", 0),
+    ("", "abc", 3),
+    ("kitten", "sitting", 3),
+    ("flaw", "lawn", 2),
+])
+def test_edit_distance(ref, hyp, expected):
+    assert edit_distance(ref, hyp) == expected
+
+
+def test_accumulator_corpus_wer():
+    scores = WerAccumulator()
+    scores.add("a b c d", "a b c d", "english", "stub")
+    scores.add("a b", "a", "english", "stub")
+    scores.add("", "x", "english", "stub")
+    summary = scores.summary()
+    # 1 deletion and 1 insertion over 6 reference words
+    assert summary["corpus"]["WER"] == round(2 / 6, 3)
+    assert summary["by_engine_language"]["stub/english"]["utterances"] == 3
+
+
+def test_accumulator_merge():
+    pairs = list(random_pairs(50, seed=2))
+    whole = WerAccumulator()
+    left = WerAccumulator()
+    right = WerAccumulator()
+    for k, (ref, hyp) in enumerate(pairs):
+        whole.add(ref, hyp, "english", "stub")
+        (left if k % 2 else right).add(ref, hyp, "english", "stub")
+    left.merge(right)
+    assert left.summary() == whole.summary()
@@ -0,0 +1,131 @@
+import asyncio
+import io
+import json
+import wave
+
+import numpy as np
+
+from server import AdmissionControl, HttpError, TranscriptionServer
+
+
+def wav_bytes(samples, rate=16000, channels=1):
+    data = io.BytesIO()
+    with wave.open(data, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+    return data.getvalue()
+
+
+def test_admission_rejects_a_burst_over_the_queue():
+    async def burst():
+        admission = AdmissionControl(workers=1, max_queue=1, queue_timeout=5.0)
+
+        async def session():
+            async with admission.slot():
+                await asyncio.sleep(0.05)
+
+        results = await asyncio.gather(*[session() for _ in range(4)], return_exceptions=True)
+        return admission, results
+
+    admission, results = asyncio.run(burst())
+    rejected = [result for result in results if isinstance(result, HttpError)]
+    assert [error.status for error in rejected] == [503, 503]
+    assert admission.stats()["served"] == 2
+    assert admission.stats()["rejected"] == 2
+
+
+def test_admission_times_out_in_queue():
+    async def run():
+        admission = AdmissionControl(workers=1, max_queue=1, queue_timeout=0.05)
+
+        async def session(seconds):
+            async with admission.slot():
+                await asyncio.sleep(seconds)
+
+        return await asyncio.gather(session(0.2), session(0), return_exceptions=True)
+
+    first, second = asyncio.run(run())
+    assert first is None
+    assert isinstance(second, HttpError) and "timed out" in second.message
+
+
+async def request(port, target, body):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"POST %s HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (target.encode(), len(body)) + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+def test_slow_upload_does_not_hold_a_worker():
+    async def run():
+        server = TranscriptionServer(workers=1, max_queue=0, engine="stub")
+        server.admission = AdmissionControl(1, 0, 1.0)
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        body = wav_bytes(np.zeros(32000))
+        # an upload that has sent its headers and half of its body
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /transcribe HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body[:1000])
+        await writer.drain()
+        await asyncio.sleep(0.05)
+        try:
+            # with no queue, this is only served if the slow upload holds no slot
+            return await request(port, "/transcribe", body)
+        finally:
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+
+    response = asyncio.run(run())
+    assert response.startswith(b"HTTP/1.1 200")
+    assert b'"final"' in response
+
+
+def serve_requests(*requests):
+    """run a stub server and send it each (target, body), returns the raw responses."""
+    async def run():
+        server = TranscriptionServer(workers=2, max_queue=2, engine="stub")
+        server.admission = AdmissionControl(2, 2, 5.0)
+        listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            return [await request(port, target, body) for target, body in requests]
+        finally:
+            listener.close()
+            await listener.wait_closed()
+
+    return asyncio.run(run())
+
+
+def final_text(response):
+    for line in response.split(b"\r\n"):
+        if line.startswith(b"{"):
+            result = json.loads(line)
+            if result["type"] == "final":
+                return result["text"]
+    return None
+
+
+def test_uploads_are_converted_to_the_recognizer_format():
+    # 2.5 s of 44.1 kHz stereo, which the stub hears as two words
+    stereo = np.zeros((110250, 2), dtype=np.int16)
+    wav, = serve_requests(("/transcribe", wav_bytes(stereo, 44100, channels=2)))
+    assert wav.startswith(b"HTTP/1.1 200")
+    assert final_text(wav) == "stub0 stub1"
+
+
+def test_streams_are_downmixed_and_resampled():
+    # 2.5 s of 8 kHz stereo
+    pcm = np.zeros(20000 * 2, dtype="<i2").tobytes()
+    response, = serve_requests(("/stream?rate=8000&channels=2", pcm))
+    assert final_text(response) == "stub0 stub1"
+
+
+def test_bad_audio_is_refused():
+    garbage, bad_channels = serve_requests(("/transcribe", b"not audio"), ("/stream?channels=0", b""))
+    assert garbage.startswith(b"HTTP/1.1 415")
+    assert bad_channels.startswith(b"HTTP/1.1 400")
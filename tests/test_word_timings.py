@@ -0,0 +1,59 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from word_timings import (ColumnarWriter, DetailedTranscript, from_deepspeech_metadata, from_vosk_results,
+                          load_columns, words_of)
+
+
+def deepspeech_metadata(text, start=0.5, step=0.1, confidence=-3.0):
+    tokens = [SimpleNamespace(text=char, start_time=start + i * step) for i, char in enumerate(text)]
+    return SimpleNamespace(transcripts=[SimpleNamespace(tokens=tokens, confidence=confidence)])
+
+
+def test_deepspeech_words_end_where_the_next_token_starts():
+    detailed = from_deepspeech_metadata(deepspeech_metadata("a gate"), duration=2.0)
+    assert detailed.text == "a gate"
+    (a, a_start, a_end), (gate, gate_start, gate_end) = [(w.word, w.start, w.end) for w in detailed.words]
+    assert (a, gate) == ("a", "gate")
+    # a one-letter word lasts until the space after it
+    assert a_start == pytest.approx(0.5) and a_end == pytest.approx(0.6)
+    assert gate_start == pytest.approx(0.7)
+    # the last word runs to the end of the audio
+    assert gate_end == pytest.approx(2.0)
+
+
+def test_last_deepspeech_word_without_duration_lasts_a_frame():
+    word, = from_deepspeech_metadata(deepspeech_metadata("i")).words
+    assert word.end - word.start == pytest.approx(0.02)
+    assert math.isnan(word.conf)
+
+
+def test_vosk_results_keep_word_confidences_and_alternatives():
+    results = [{"result": [{"word": "hello", "start": 0.1, "end": 0.5, "conf": 0.9}], "text": "hello"},
+               {"text": ""},
+               {"alternatives": [{"text": "gate four", "confidence": 300.0,
+                                  "result": [{"word": "gate", "start": 1.0, "end": 1.3},
+                                             {"word": "four", "start": 1.3, "end": 1.6}]},
+                                 {"text": "gate for", "confidence": 290.0}]}]
+    detailed = from_vosk_results(results)
+    assert detailed.text == "hello gate four"
+    assert [(word.word, word.segment) for word in detailed.words] == [("hello", 0), ("gate", 2), ("four", 2)]
+    assert detailed.words[0].conf == 0.9 and math.isnan(detailed.words[1].conf)
+    # an empty segment has no alternatives
+    assert [(alt.segment, alt.rank, alt.text) for alt in detailed.alternatives] == [
+        (0, 0, "hello"), (2, 0, "gate four"), (2, 1, "gate for")]
+
+
+def test_columns_round_trip(tmp_path):
+    writer = ColumnarWriter()
+    writer.add("a.wav", from_deepspeech_metadata(deepspeech_metadata("a gate"), duration=2.0))
+    writer.add("b.wav", DetailedTranscript("", [], []))
+    path = str(tmp_path / "details.npz")
+    writer.save(path)
+    columns = load_columns(path)
+    rows = words_of(columns, columns["strings"].index("a.wav"))
+    assert [(word, round(start, 3), round(end, 3), conf) for word, start, end, conf in rows] == [
+        ("a", 0.5, 0.6, None), ("gate", 0.7, 2.0, None)]
+    assert list(columns["alternatives"]["rank"]) == [0]
@@ -0,0 +1,218 @@
+"""
+Tracing
+-------
+
+Lightweight per-stage timing for the load -> denoise -> decode -> score path.
+
+    with tracer.stage("decode"):
+        res = ds.stt(audio)
+
+- Stage timings go into fixed-bucket histograms, plus a counter of the
+  errors raised inside each stage
+- tracer.utterance(name) can wrap a whole utterance with cProfile and/or
+  tracemalloc capture
+- Results export as Prometheus text or as JSON lines
+
+When tracing is disabled, stage() returns one shared no-op context manager,
+so an instrumented call costs a method call and an attribute check. When it
+is enabled, a stage costs two perf_counter() calls and a bucket search,
+which is far below 1% of any stage worth timing here.
+
+Configuration of the default tracer (environment variables):
+
+- ASR_TRACE: output file, ".prom" for Prometheus text, anything else JSON lines
+- ASR_TRACE_PROFILE: directory for one cProfile dump per utterance
+- ASR_TRACE_MEMORY: set to 1 to record tracemalloc peaks per utterance
+
+------------------------
+
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+# histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        cumulative = []
+        total = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), self.counts):
+            total += count
+            cumulative.append([bound, total])
+        return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullContext()
+
+
+class _Stage:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.tracer.count(self.name + "_errors")
+        return False
+
+
+class _Utterance:
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        if self.tracer.profile_dir:
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if self.tracer.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {"utterance": self.name, "seconds": round(time.perf_counter() - self.start, 6)}
+        if self.profiler is not None:
+            self.profiler.disable()
+            os.makedirs(self.tracer.profile_dir, exist_ok=True)
+            safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in str(self.name))
+            path = os.path.join(self.tracer.profile_dir, "%s.prof" % safe_name)
+            self.profiler.dump_stats(path)
+            record["profile"] = path
+        if self.tracer.trace_memory:
+            import tracemalloc
+
+            record["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        self.tracer.observe("utterance", record["seconds"])
+        self.tracer.record(record)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=False, output=None, profile_dir=None, trace_memory=False):
+        self.enabled = enabled
+        self.output = output
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        self.histograms = {}
+        self.counters = {}
+        self.records = []
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """context manager timing one pipeline stage."""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def utterance(self, name):
+        """context manager for optional cProfile/tracemalloc capture of one utterance."""
+        if not self.enabled or not (self.profile_dir or self.trace_memory):
+            return _NULL
+        return _Utterance(self, name)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def snapshot(self):
+        with self._lock:
+            return {"timestamp": time.time(),
+                    "pid": os.getpid(),
+                    "counters": dict(self.counters),
+                    "stages": {name: histogram.as_dict() for name, histogram in self.histograms.items()}}
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = ["# TYPE asr_stage_seconds histogram"]
+        for name, histogram in sorted(snapshot["stages"].items()):
+            for bound, count in histogram["buckets"]:
+                lines.append('asr_stage_seconds_bucket{stage="%s",le="%s"} %d' % (name, bound, count))
+            lines.append('asr_stage_seconds_sum{stage="%s"} %s' % (name, histogram["sum"]))
+            lines.append('asr_stage_seconds_count{stage="%s"} %d' % (name, histogram["count"]))
+        lines.append("# TYPE asr_events_total counter")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append('asr_events_total{name="%s"} %d' % (name, value))
+        return "\n".join(lines) + "\n"
+
+    def export(self, path=None):
+        """write Prometheus text (.prom) or append a JSON lines snapshot."""
+        path = path or self.output
+        if not path:
+            return
+        if path.endswith(".prom"):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            return
+        with self._lock:
+            records = self.records
+            self.records = []
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+
+def _from_env():
+    output = os.environ.get("ASR_TRACE")
+    return Tracer(enabled=bool(output),
+                  output=output,
+                  profile_dir=os.environ.get("ASR_TRACE_PROFILE"),
+                  trace_memory=os.environ.get("ASR_TRACE_MEMORY") == "1")
+
+
+# Shared tracer used across the pipeline
+tracer = _from_env()
+if tracer.enabled:
+    atexit.register(tracer.export)
@@ -0,0 +1,129 @@
+"""
+Voice Activity Detection
+------------------------
+
+Frame-level speech detection and utterance segmentation for microphone input.
+
+Detectors classify one short frame (10-30 ms) at a time:
+
+- EnergyVad: log energy plus zero-crossing rate against an adaptive noise
+  floor, no extra dependencies
+- WebRtcVad: the WebRTC frame classifier, needs the optional `webrtcvad`
+  package
+
+Segmenter turns the per-frame decisions into utterances, with pre-roll
+(audio kept from just before speech starts) and hangover (silence tolerated
+before the utterance is closed). Only speech frames are passed on, so the
+recognizer never spends time on silence, and the end-of-utterance latency is
+the hangover setting.
+
+------------------------
+
+"""
+import collections
+
+import numpy as np
+
+
+class EnergyVad:
+    """energy + zero-crossing detector with an adaptive noise floor."""
+
+    def __init__(self, samplerate, threshold_db=9.0, max_zcr=0.35, adapt_rate=0.05):
+        self.samplerate = samplerate
+        # a frame is speech when it is this many dB above the noise floor
+        self.threshold_db = threshold_db
+        # unvoiced noise crosses zero far more often than speech does
+        self.max_zcr = max_zcr
+        self.adapt_rate = adapt_rate
+        self.noise_floor_db = None
+
+    def is_speech(self, frame):
+        samples = frame.astype(np.float32)
+        energy_db = 10.0 * np.log10(np.mean(samples * samples) + 1.0)
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / float(max(1, len(samples) - 1))
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = energy_db
+        speech = energy_db > self.noise_floor_db + self.threshold_db and zcr < self.max_zcr
+        if not speech:
+            # follow the background level, faster downwards than upwards
+            rate = self.adapt_rate if energy_db > self.noise_floor_db else 4 * self.adapt_rate
+            self.noise_floor_db += rate * (energy_db - self.noise_floor_db)
+        return speech
+
+
+class WebRtcVad:
+    """WebRTC frame classifier (10, 20 or 30 ms frames at 8/16/32/48 kHz)."""
+
+    def __init__(self, samplerate, aggressiveness=2):
+        try:
+            import webrtcvad
+        except ImportError:
+            raise ImportError("WebRtcVad needs the webrtcvad package: pip install webrtcvad")
+        self.samplerate = samplerate
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame):
+        return self._vad.is_speech(frame.tobytes(), self.samplerate)
+
+
+def create_vad(kind, samplerate, **options):
+    """build a detector by name: "energy" or "webrtc"."""
+    if kind == "webrtc":
+        return WebRtcVad(samplerate, **options)
+    if kind == "energy":
+        return EnergyVad(samplerate, **options)
+    raise ValueError("Unknown VAD: %s" % kind)
+
+
+class Segmenter:
+    """groups classified frames into utterances with pre-roll and hangover padding."""
+
+    def __init__(self, vad, samplerate, frame_ms=30, pre_roll_ms=300, hangover_ms=400, min_speech_ms=90):
+        self.vad = vad
+        self.frame_samples = samplerate * frame_ms // 1000
+        self._pre_roll = collections.deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        # speech shorter than this (clicks, bumps) does not open an utterance
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self._pending = []
+        self._speech_run = 0
+        self._silence_run = 0
+        self.in_speech = False
+
+    def process(self, frame):
+        """classify one frame, returns a list of (event, frames) tuples.
+
+        Events are "start" with the pre-roll and first speech frames, "speech"
+        with one frame inside an utterance, and "end" when the hangover has
+        run out (the trailing frames are included in the preceding events).
+        """
+        speech = self.vad.is_speech(frame)
+        if not self.in_speech:
+            if speech:
+                self._speech_run += 1
+                self._pending.append(frame)
+                if self._speech_run >= self.min_speech_frames:
+                    self.in_speech = True
+                    self._silence_run = 0
+                    frames = list(self._pre_roll) + self._pending
+                    self._pre_roll.clear()
+                    self._pending = []
+                    self._speech_run = 0
+                    return [("start", frames)]
+            else:
+                # a too-short burst becomes part of the pre-roll
+                for pending in self._pending:
+                    self._pre_roll.append(pending)
+                self._pending = []
+                self._speech_run = 0
+                self._pre_roll.append(frame)
+            return []
+
+        self._silence_run = 0 if speech else self._silence_run + 1
+        if self._silence_run >= self.hangover_frames:
+            self.in_speech = False
+            self._silence_run = 0
+            return [("speech", [frame]), ("end", [])]
+        return [("speech", [frame])]
@@ -0,0 +1,192 @@
+"""
+Vosk Sessions
+-------------
+
+Many concurrent Vosk audio streams over one loaded Model per language.
+
+    manager = SessionManager(workers=4)
+    session = manager.open("english", 16000, on_result=print)
+    session.feed(block)          # int16 samples, from any thread
+    session.end_utterance()      # emit the final result, keep the session
+    session.close()              # emit the final result, end the session
+    manager.shutdown()
+
+- The Model comes from VoskRecognizer's language models (so the model
+  registry), and KaldiRecognizers from its pool: they are reset and reused
+  between utterances instead of being rebuilt
+- Each session has its own bounded queue, so a slow or stalled session only
+  blocks its own producer; feed() waits (or raises queue.Full after its
+  timeout) while that queue is full
+- Sessions are spread over a fixed set of worker threads, each session
+  pinned to one worker so its audio is always processed in order
+
+on_result(kind, text) is called from the worker thread with kind "partial"
+or "final".
+
+------------------------
+
+"""
+import json
+import queue
+import threading
+
+import numpy as np
+
+from recognizer import VoskRecognizer
+
+_END_UTTERANCE = object()
+_CLOSE = object()
+
+
+class Session:
+    def __init__(self, manager, session_id, recognizer, on_result, max_blocks, worker):
+        self.manager = manager
+        self.id = session_id
+        self.recognizer = recognizer
+        self.on_result = on_result
+        self.queue = queue.Queue(max_blocks)
+        self.closed = threading.Event()
+        self._worker = worker
+        self._rec = None
+        self._last_partial = ""
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def feed(self, block, timeout=None):
+        """queue a block of int16 samples, waiting while the session is behind."""
+        self._put(np.asarray(block, dtype=np.int16).tobytes(), timeout)
+
+    def end_utterance(self, timeout=None):
+        self._put(_END_UTTERANCE, timeout)
+
+    def close(self, wait=True, timeout=None):
+        self._put(_CLOSE, timeout)
+        if wait:
+            self.closed.wait(timeout)
+
+    def _put(self, item, timeout):
+        if self.closed.is_set():
+            raise RuntimeError("Session %d is closed" % self.id)
+        self.queue.put(item, timeout=timeout)
+        self._worker.schedule(self)
+
+    def _finish_utterance(self):
+        if self._rec is None:
+            return
+        text = json.loads(self._rec.FinalResult())["text"]
+        self.recognizer.pool().release(self._rec)
+        self._rec = None
+        self._last_partial = ""
+        self.on_result("final", text)
+
+    def _process(self, item):
+        if item is _END_UTTERANCE:
+            self._finish_utterance()
+        elif item is _CLOSE:
+            self._finish_utterance()
+            self.manager._forget(self)
+            self.closed.set()
+        else:
+            if self._rec is None:
+                self._rec = self.recognizer.pool().acquire()
+            if self._rec.AcceptWaveform(item):
+                self._last_partial = ""
+                self.on_result("final", json.loads(self._rec.Result())["text"])
+            else:
+                partial = json.loads(self._rec.PartialResult())["partial"]
+                if partial != self._last_partial:
+                    self._last_partial = partial
+                    self.on_result("partial", partial)
+
+    def _drain(self, max_items):
+        """process up to max_items queued items, runs on the session's worker."""
+        for _ in range(max_items):
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self._process(item)
+            except Exception as e:
+                print("Session", self.id, "failed:", e.args)
+        with self._lock:
+            self._scheduled = False
+        # anything fed while we were finishing up is picked up here
+        if not self.queue.empty() and not self.closed.is_set():
+            self._worker.schedule(self)
+
+    def stats(self):
+        return {"id": self.id, "language": self.recognizer.language, "queued": self.queue.qsize(),
+                "closed": self.closed.is_set()}
+
+
+class _Worker(threading.Thread):
+    def __init__(self, index, batch):
+        super().__init__(name="vosk-session-%d" % index, daemon=True)
+        self.batch = batch
+        self.ready = queue.Queue()
+        self.sessions = 0
+
+    def schedule(self, session):
+        with session._lock:
+            if session._scheduled:
+                return
+            session._scheduled = True
+        self.ready.put(session)
+
+    def run(self):
+        while True:
+            session = self.ready.get()
+            if session is None:
+                return
+            # a bounded batch per turn keeps one busy session from starving
+            # the others on this worker
+            session._drain(self.batch)
+
+
+class SessionManager:
+    def __init__(self, workers=4, max_blocks=64, batch=8):
+        self.max_blocks = max_blocks
+        self._workers = [_Worker(index, batch) for index in range(workers)]
+        for worker in self._workers:
+            worker.start()
+        self._sessions = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def open(self, language, sample_rate, on_result, max_blocks=None):
+        """start a session, loading the language's model if it is not loaded yet."""
+        recognizer = VoskRecognizer(language, sample_rate=sample_rate)
+        recognizer.load()
+        with self._lock:
+            self._next_id += 1
+            # the least loaded worker takes the new session
+            worker = min(self._workers, key=lambda item: item.sessions)
+            worker.sessions += 1
+            session = Session(self, self._next_id, recognizer, on_result, max_blocks or self.max_blocks, worker)
+            self._sessions[session.id] = session
+        return session
+
+    def _forget(self, session):
+        with self._lock:
+            if self._sessions.pop(session.id, None) is not None:
+                session._worker.sessions -= 1
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+    def stats(self):
+        return {"sessions": [session.stats() for session in self.sessions()],
+                "workers": [worker.sessions for worker in self._workers],
+                "pools": {"%s@%d%s" % (language, rate, " (domain)" if grammar else ""): pool.stats()
+                          for (language, rate, grammar), pool in VoskRecognizer.pools.items()}}
+
+    def shutdown(self, timeout=None):
+        """close every open session, then stop the workers."""
+        for session in self.sessions():
+            session.close(wait=True, timeout=timeout)
+        for worker in self._workers:
+            worker.ready.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
@@ -0,0 +1,197 @@
+"""
+Word Timings
+------------
+
+Word timings, word confidences and N-best alternatives captured in the same
+decoding pass as the text, and stored as columns for large-scale analysis.
+
+    detailed = recognizer.transcribe_detailed(audio_file, alternatives=3)
+    detailed.text, detailed.words[0].start, detailed.alternatives[1].text
+
+    table = ColumnarWriter()
+    table.add(audio_file, detailed)
+    table.save("details.npz")            # or "details.parquet" with pyarrow
+    columns = load_columns("details.npz")
+
+Vosk only reports per-word confidence when no alternatives are asked for,
+and DeepSpeech only reports a confidence per transcript, so missing
+confidences are NaN.
+
+The .npz holds two tables as packed arrays. Strings (files, words,
+alternative texts) are stored once in a UTF-8 blob with offsets and referred
+to by index.
+
+- words: file, segment, word, start, end, conf
+- alternatives: file, segment, rank, confidence, text
+
+------------------------
+
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+Word = namedtuple("Word", ["word", "start", "end", "conf", "segment"])
+Alternative = namedtuple("Alternative", ["segment", "rank", "confidence", "text"])
+DetailedTranscript = namedtuple("DetailedTranscript", ["text", "words", "alternatives"])
+
+NAN = float("nan")
+
+
+def from_vosk_results(results):
+    """DetailedTranscript from the parsed Result()/FinalResult() JSON of each segment."""
+    words = []
+    alternatives = []
+    texts = []
+    for segment, result in enumerate(results):
+        if "alternatives" in result:
+            candidates = result["alternatives"]
+        else:
+            candidates = [{"text": result.get("text", ""), "result": result.get("result", []), "confidence": NAN}]
+        if not candidates or not candidates[0].get("text"):
+            continue
+        for rank, candidate in enumerate(candidates):
+            alternatives.append(Alternative(segment, rank, candidate.get("confidence", NAN), candidate["text"]))
+        best = candidates[0]
+        texts.append(best["text"])
+        for item in best.get("result", []):
+            words.append(Word(item["word"], item["start"], item["end"], item.get("conf", NAN), segment))
+    return DetailedTranscript(" ".join(texts), words, alternatives)
+
+
+# DeepSpeech emits one token per 20 ms acoustic frame at most
+DEEPSPEECH_FRAME_SECONDS = 0.02
+
+
+def _deepspeech_words(transcript, duration=None):
+    """group DeepSpeech character tokens into timed words.
+
+    Tokens only carry a start time, so a word ends where the space after it
+    starts, or at the end of the audio (duration) for the last word.
+    """
+    words = []
+    current = ""
+    start = last = None
+    for token in transcript.tokens:
+        if token.text == " ":
+            if current:
+                words.append(Word(current, start, token.start_time, NAN, 0))
+            current = ""
+            continue
+        if not current:
+            start = token.start_time
+        current += token.text
+        last = token.start_time
+    if current:
+        end = duration if duration is not None and duration > last else last + DEEPSPEECH_FRAME_SECONDS
+        words.append(Word(current, start, end, NAN, 0))
+    return words
+
+
+def from_deepspeech_metadata(metadata, duration=None):
+    """DetailedTranscript from sttWithMetadata; timings and words come from the best transcript.
+
+    duration is the length of the decoded audio in seconds, where the last word ends.
+    """
+    transcripts = list(metadata.transcripts)
+    alternatives = [Alternative(0, rank, transcript.confidence, "".join(token.text for token in transcript.tokens))
+                    for rank, transcript in enumerate(transcripts)]
+    if not transcripts:
+        return DetailedTranscript("", [], [])
+    return DetailedTranscript(alternatives[0].text, _deepspeech_words(transcripts[0], duration), alternatives)
+
+
+def _pack(strings):
+    data = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(item) for item in data])
+    return np.frombuffer(b"".join(data), dtype=np.uint8), offsets
+
+
+def _unpack(blob, offsets):
+    data = blob.tobytes()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+class ColumnarWriter:
+    """collects DetailedTranscripts of many files into two column tables."""
+
+    def __init__(self):
+        self._strings = {}
+        self.words = {name: [] for name in ("file", "segment", "word", "start", "end", "conf")}
+        self.alternatives = {name: [] for name in ("file", "segment", "rank", "confidence", "text")}
+
+    def _intern(self, text):
+        return self._strings.setdefault(text, len(self._strings))
+
+    def add(self, audio_file, detailed):
+        file_id = self._intern(audio_file)
+        for word in detailed.words:
+            for name, value in (("file", file_id), ("segment", word.segment), ("word", self._intern(word.word)),
+                                ("start", word.start), ("end", word.end), ("conf", word.conf)):
+                self.words[name].append(value)
+        for alternative in detailed.alternatives:
+            for name, value in (("file", file_id), ("segment", alternative.segment), ("rank", alternative.rank),
+                                ("confidence", alternative.confidence), ("text", self._intern(alternative.text))):
+                self.alternatives[name].append(value)
+
+    def _columns(self):
+        types = {"file": np.int32, "segment": np.int32, "word": np.int32, "text": np.int32, "rank": np.int16,
+                 "start": np.float32, "end": np.float32, "conf": np.float32, "confidence": np.float32}
+        words = {name: np.asarray([NAN if value is None else value for value in values], dtype=types[name])
+                 for name, values in self.words.items()}
+        alternatives = {name: np.asarray(values, dtype=types[name]) for name, values in self.alternatives.items()}
+        return words, alternatives
+
+    def strings(self):
+        return sorted(self._strings, key=self._strings.get)
+
+    def save(self, path):
+        words, alternatives = self._columns()
+        if path.endswith(".parquet"):
+            self._save_parquet(path, words, alternatives)
+            return
+        blob, offsets = _pack(self.strings())
+        arrays = {"strings_blob": blob, "strings_offsets": offsets}
+        arrays.update({"words_" + name: values for name, values in words.items()})
+        arrays.update({"alternatives_" + name: values for name, values in alternatives.items()})
+        np.savez_compressed(path, **arrays)
+
+    def _save_parquet(self, path, words, alternatives):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # strings become dictionary columns, the Arrow counterpart of the interned ids
+        strings = pa.array(self.strings())
+
+        def table(columns, string_columns):
+            fields = {}
+            for name, values in columns.items():
+                if name in string_columns:
+                    fields[name] = pa.DictionaryArray.from_arrays(pa.array(values), strings)
+                else:
+                    fields[name] = pa.array(values)
+            return pa.table(fields)
+
+        pq.write_table(table(words, ("file", "word")), path)
+        pq.write_table(table(alternatives, ("file", "text")), path[:-len(".parquet")] + ".alternatives.parquet")
+
+
+def load_columns(path):
+    """read a .npz written by ColumnarWriter, returns {"strings", "words", "alternatives"}."""
+    with np.load(path) as data:
+        columns = {"strings": _unpack(data["strings_blob"], data["strings_offsets"]), "words": {}, "alternatives": {}}
+        for key in data.files:
+            for table in ("words", "alternatives"):
+                if key.startswith(table + "_"):
+                    columns[table][key[len(table) + 1:]] = data[key]
+    return columns
+
+
+def words_of(columns, file_index):
+    """the (word, start, end, conf) rows of one file in loaded columns."""
+    words = columns["words"]
+    rows = np.nonzero(words["file"] == file_index)[0]
+    return [(columns["strings"][words["word"][i]], float(words["start"][i]), float(words["end"][i]),
+             None if math.isnan(words["conf"][i]) else float(words["conf"][i])) for i in rows]